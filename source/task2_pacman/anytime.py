@@ -0,0 +1,112 @@
+import time
+from heapq import heappush, heappop, heapify
+
+from astar import Node, reconstruct, successor_fn, heuristic_fn, _stopped, CHECK_EVERY
+
+def ara_star(problem, heuristic, goal_fn=None, w0=2.5, w_step=0.5, on_solution=None,
+             max_expanded=200000, time_limit=None, cancel=None):
+    """
+    Anytime Repairing A* (ARA*): f_w = g + w*h, bắt đầu w = w0 rồi giảm w_step mỗi vòng
+    (tối thiểu 1). Giữ g/CLOSED/INCONS giữa các vòng nên vòng sau chỉ sửa phần cần sửa.
+    Mỗi lời giải tốt hơn được báo qua on_solution(res) với res["weight"], res["bound"] = w của vòng
+    gần nhất đã chạy hết (None nếu chưa có). cost ≤ bound·tối ưu chỉ đúng khi h chấp nhận được;
+    MST với goal "ăn 1 food" thì không (h(goal) > 0), nên không dừng sớm theo cận tính từ h mà
+    luôn giảm w tới 1, và goal so với OPEN theo f_w = g + w*h(goal) như astar.
+    Trả về lời giải tốt nhất cùng định dạng astar (+ "weight", "bound", "solutions");
+    hết ngân sách thì giữ lời giải đang có, chưa có thì reason như astar.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit if time_limit is not None else None
+    hfun = heuristic_fn(heuristic)
+    expand = successor_fn(problem)
+    is_goal = problem.is_goal if goal_fn is None else (lambda st: bool(goal_fn(st)))
+
+    start = problem.initial_state()
+    nodes = {start: Node(start, 0.0, hfun(start), None, None)}  # node tốt nhất của mỗi state
+    open_keys = {start}
+    closed, incons = set(), set()
+    w = max(1.0, float(w0))
+    heap, tie = [(nodes[start].g + w * nodes[start].h, 0, start, 0.0)], 1
+
+    best = None          # Node goal tốt nhất
+    expanded = 0
+    generated = 1
+    solutions = 0
+    reported = None      # cost của lời giải đã báo gần nhất
+    bound = None         # w của vòng gần nhất đã chạy hết (None: chưa có vòng nào)
+
+    def result(bound, reason=None):
+        out = {"solution": None, "actions": [], "cost": float("inf"),
+               "generated": generated, "expanded": expanded,
+               "weight": w, "bound": bound, "solutions": solutions}
+        if best is not None:
+            states, actions = reconstruct(best)
+            out.update(solution=states, actions=actions, cost=best.g)
+        if reason is not None:
+            out["reason"] = reason
+        return out
+
+    while True:
+        # ---- ImprovePath với w hiện tại ----
+        stop = None
+        while heap:
+            if expanded > max_expanded:
+                stop = "limit"
+            elif expanded % CHECK_EVERY == 0 and cancel is not None and cancel.is_set():
+                stop = "cancelled"
+            elif expanded % CHECK_EVERY == 0 and deadline is not None and time.perf_counter() >= deadline:
+                stop = "timeout"
+            if stop:
+                break
+            fw, _, k, gk = heap[0]
+            if k in closed or gk != nodes[k].g:
+                heappop(heap)       # mục cũ (đã đóng hoặc g đã giảm)
+                continue
+            if best is not None and best.g + w * best.h < fw:
+                break       # so f_w của goal (h(goal) > 0 với goal "ăn 1 food"); hoà thì pop tiếp
+            heappop(heap)
+            closed.add(k)
+            node = nodes[k]
+            if is_goal(k):
+                if best is None or node.g < best.g:
+                    best = node
+                continue
+            expanded += 1
+            for a, s2, cost in expand(k):
+                g2 = node.g + cost
+                old = nodes.get(s2)
+                if old is not None and g2 >= old.g:
+                    continue
+                h2 = old.h if old is not None else hfun(s2, k)
+                nodes[s2] = Node(s2, g2, h2, node, a)
+                generated += 1
+                if s2 in closed:
+                    incons.add(s2)
+                else:
+                    open_keys.add(s2)
+                    heappush(heap, (g2 + w * h2, tie, s2, g2))
+                    tie += 1
+
+        if stop is None:
+            bound = w       # vòng đã chạy hết: lời giải là lời giải của vòng w này
+        if best is not None and (reported is None or best.g < reported):
+            reported = best.g
+            solutions += 1
+            if on_solution is not None:
+                on_solution(result(bound))
+        if stop is not None:
+            if best is None:
+                return _stopped(stop, generated, expanded, len(heap), t0)
+            return result(bound, stop)
+        if best is None and not heap:
+            return result(bound)     # không có lời giải
+        if w <= 1.0:
+            return result(bound)
+
+        # ---- giảm w, đưa INCONS vào OPEN, dựng lại heap theo w mới ----
+        w = max(1.0, w - w_step)
+        open_keys = {k for k in open_keys if k not in closed} | incons
+        incons, closed = set(), set()
+        heap = [(nodes[k].g + w * nodes[k].h, i, k, nodes[k].g) for i, k in enumerate(open_keys)]
+        tie = len(heap)
+        heapify(heap)
@@ -1,4 +1,6 @@
+import time
 from heapq import heappush, heappop
+from collections import deque
 
 class Node:
     __slots__ = ("state","g","h","parent","action")
@@ -10,12 +12,95 @@ class Node:
         self.action = action
     def f(self): return self.g + self.h
 
-def reconstruct(node):
+# ---------- Open list ----------
+class HeapOpenList:
+    """Heap nhị phân (f, tie, node): mặc định, f thực bất kỳ, hoà thì FIFO."""
+    def __init__(self):
+        self._pq = []
+        self._tie = 0
+
+    def push(self, f, node):
+        heappush(self._pq, (f, self._tie, node))
+        self._tie += 1
+
+    def pop(self):
+        return heappop(self._pq)[2]
+
+    def __len__(self):
+        return len(self._pq)
+
+class BucketOpenList:
+    """
+    Bucket queue cho f nguyên (step_cost = 1, h nguyên): push/pop O(1) trừ khi dời con trỏ f.
+    tie_break trong cùng tầng f: "fifo" (mặc định, cùng thứ tự với HeapOpenList nên expand y hệt),
+    "high_g" (ưu tiên g lớn) hoặc "lifo". high_g không chắc giảm expand: h MST không nhất quán,
+    trên map mẫu nó expand 2288 so với 1821 của fifo, trên bench large thì ít hơn (50586 so với 75689).
+    """
+    TIE_BREAKS = ("fifo", "high_g", "lifo")
+
+    def __init__(self, tie_break: str = "fifo"):
+        if tie_break not in self.TIE_BREAKS:
+            raise ValueError(f"tie_break phải thuộc {self.TIE_BREAKS}")
+        self.tie_break = tie_break
+        self._layers = {}   # f -> {g: [node]} (high_g) | deque[node]
+        self._min_f = None
+        self._size = 0
+
+    def push(self, f, node):
+        if f != int(f):
+            raise ValueError(f"BucketOpenList cần f nguyên, nhận {f}")
+        f = int(f)
+        layer = self._layers.get(f)
+        if layer is None:
+            layer = {} if self.tie_break == "high_g" else deque()
+            self._layers[f] = layer
+        if self.tie_break == "high_g":
+            layer.setdefault(int(node.g), []).append(node)
+        else:
+            layer.append(node)
+        if self._min_f is None or f < self._min_f:
+            self._min_f = f
+        self._size += 1
+
+    def pop(self):
+        if self._size == 0:
+            raise IndexError("pop from empty open list")
+        while self._min_f not in self._layers:
+            self._min_f += 1
+        layer = self._layers[self._min_f]
+        if self.tie_break == "high_g":
+            g = max(layer)
+            bucket = layer[g]
+            node = bucket.pop()
+            if not bucket:
+                del layer[g]
+        elif self.tie_break == "lifo":
+            node = layer.pop()
+        else:
+            node = layer.popleft()
+        if not layer:
+            del self._layers[self._min_f]
+        self._size -= 1
+        return node
+
+    def __len__(self):
+        return self._size
+
+OPEN_LISTS = ("heap", "bucket")
+
+def make_open_list(kind="heap", tie_break="fifo"):
+    if kind == "heap":
+        return HeapOpenList()
+    if kind == "bucket":
+        return BucketOpenList(tie_break)
+    raise ValueError(f"open_list không hợp lệ: {kind!r} (chọn trong {OPEN_LISTS})")
+
+def reconstruct(node, codec=None):
     states = []
     actions = []
     cur = node
     while cur is not None:
-        states.append(cur.state)
+        states.append(cur.state if codec is None else codec.decode(cur.state))
         actions.append(cur.action)
         cur = cur.parent
     states.reverse()
@@ -24,74 +109,221 @@ def reconstruct(node):
         actions = actions[1:]
     return states, actions
 
-def astar(problem, heuristic, graph_search=True, goal_fn=None, max_expanded=200000):
+def _action_prio(a):
+    return 0 if a in ("TUL","TUR","TBL","TBR") else 1
+
+def _generic_successors(problem, s):
+    """(action, child, cost) qua actions/result/step_cost cho problem không có successors()."""
+    try:
+        act_list = list(problem.actions(s))
+    except Exception:
+        act_list = []
+    act_list.sort(key=_action_prio)
+    out = []
+    for a in act_list:
+        try:
+            s2 = problem.result(s, a)
+        except Exception:
+            s2 = None
+        if s2 is None:
+            continue
+        try:
+            cost = float(problem.step_cost(s, a, s2))
+        except Exception:
+            cost = 1.0
+        out.append((a, s2, cost))
+    return out
+
+def successor_fn(problem):
+    # problem có successors(s) thì dùng luôn (một lần dựng ngữ cảnh, không try/except)
+    return getattr(problem, "successors", None) or (lambda st: _generic_successors(problem, st))
+
+def heuristic_fn(heuristic):
+    """h(s, parent=None) an toàn: lỗi -> 0; chỉ truyền parent khi heuristic có uses_parent_hint."""
+    h = getattr(heuristic, "h", None)
+    if h is None:
+        return lambda st, parent=None: 0.0
+    # heuristic có thể nhận state cha làm gợi ý (vd. sửa MST tăng dần)
+    parent_hint = bool(getattr(heuristic, "uses_parent_hint", False))
+    def _h(st, parent=None):
+        try:
+            if parent_hint and parent is not None:
+                return float(h(st, parent) or 0.0)
+            return float(h(st) or 0.0)
+        except Exception:
+            return 0.0
+    return _h
+
+# số expand giữa hai lần kiểm tra deadline/cancel
+CHECK_EVERY = 64
+
+def _stopped(reason, generated, expanded, open_size, t0):
+    """Kết quả dừng sớm ('limit' | 'timeout' | 'cancelled') kèm thống kê dở dang."""
+    return {"solution": None, "actions": [], "cost": float("inf"),
+            "generated": generated, "expanded": expanded, "reason": reason,
+            "open": open_size, "time_ms": (time.perf_counter() - t0) * 1000.0}
+
+# ---------- Profiling ----------
+class SearchProfile:
+    """
+    Bảng đo cho astar(profile=...): thời gian cộng dồn + số lần gọi theo pha, bộ đếm và hook.
+      pha: goal (kiểm tra đích), successors (sinh con), heuristic, heap (push/pop open list),
+           closed (tra best_g);
+      đếm: duplicates (con bị bỏ vì đã có g tốt hơn), reopened (g tốt hơn cho state đã expand),
+           stale (pop node đã có đường tốt hơn nhưng vẫn expand);
+      hooks: f(node, state, successors) gọi sau mỗi lần expand.
+    Mỗi lần đo tốn thêm một cặp perf_counter nên tổng thời gian lớn hơn khi chạy không đo.
+    """
+    PHASES = ("goal", "successors", "heuristic", "heap", "closed")
+
+    def __init__(self, hooks=()):
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.counters = {"duplicates": 0, "reopened": 0, "stale": 0}
+        self.hooks = list(hooks)
+        self.total = 0.0
+        self._closed = set()
+
+    def timed(self, phase, fn):
+        times, calls, clock = self.times, self.calls, time.perf_counter
+        def _fn(*args):
+            t = clock()
+            try:
+                return fn(*args)
+            finally:
+                times[phase] += clock() - t
+                calls[phase] += 1
+        return _fn
+
+    def merge(self, other):
+        for k in self.PHASES:
+            self.times[k] += other.times[k]
+            self.calls[k] += other.calls[k]
+        for k, v in other.counters.items():
+            self.counters[k] = self.counters.get(k, 0) + v
+        self.total += other.total
+        return self
+
+    def lines(self):
+        out = []
+        for k in self.PHASES:
+            ms = self.times[k] * 1000.0
+            share = 100.0 * self.times[k] / self.total if self.total else 0.0
+            out.append(f"{k:<11} {ms:>10.1f}ms {share:>5.1f}% | calls={self.calls[k]}")
+        rest = self.total - sum(self.times.values())
+        out.append(f"{'other':<11} {rest * 1000.0:>10.1f}ms")
+        out.append(" | ".join(f"{k}={v}" for k, v in self.counters.items()))
+        return out
+
+def astar(problem, heuristic, graph_search=True, goal_fn=None, max_expanded=200000, codec=None,
+          open_list="heap", tie_break="fifo", time_limit=None, cancel=None, dominance=False,
+          profile=None):
     """
-    A* dùng problem.actions(s) + problem.result(s,a).
-    Bỏ qua mọi result None. Không 'unpack' successors kiểu (s,a).
+    A* dùng problem.successors(s) -> [(a, s2, cost)] nếu có,
+    ngược lại problem.actions(s) + problem.result(s,a) (bỏ qua mọi result None).
+    codec (tuỳ chọn, vd. StateCodec): Node và best_g giữ state đã mã hoá,
+    chỉ giải mã khi pop; solution trả về vẫn là state đầy đủ.
+    open_list: "heap" (mặc định) | "bucket" (f nguyên, xem tie_break) | đối tượng có push/pop/len.
+    time_limit (giây) / cancel (vd. threading.Event, cần is_set()): dừng với reason
+    "timeout" / "cancelled", kiểm tra mỗi CHECK_EVERY expand.
+    dominance: closed list trội, cần problem.dominance_key(s) -> (lõi, tài nguyên) và
+    problem.dominates(a, b). Bỏ state mới khi đã có state cùng lõi với tài nguyên trội hơn
+    và g không lớn hơn; kết quả có thêm "pruned" (số node bị bỏ vì trội).
+    profile (SearchProfile): đo thời gian theo pha, đếm duplicates/reopened/stale, gọi hook mỗi expand.
     """
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit if time_limit is not None else None
+    enc = codec.encode if codec is not None else (lambda st: st)
+    hfun = heuristic_fn(heuristic)
+    expand = successor_fn(problem)
     start = problem.initial_state()
-    h0 = float(getattr(heuristic, "h", lambda s: 0.0)(start) or 0.0)
-    root = Node(start, g=0.0, h=h0, parent=None, action=None)
+    start_key = enc(start)
+    root = Node(start_key, g=0.0, h=hfun(start), parent=None, action=None)
 
-    openpq = []
-    heappush(openpq, (root.f(), 0, root))
-    best_g = {start: 0.0} if graph_search else {}
+    openpq = make_open_list(open_list, tie_break) if isinstance(open_list, str) else open_list
+    openpq.push(root.f(), root)
+    best_g = {start_key: 0.0} if graph_search else {}
     expanded = 0
     generated = 1
-    tie = 1
+
+    push, pop, closed_get = openpq.push, openpq.pop, best_g.get
+    goal_test = problem.is_goal if goal_fn is None else (lambda st: bool(goal_fn(st)))
+    prof = profile
+    if prof is not None:
+        push, pop = prof.timed("heap", push), prof.timed("heap", pop)
+        closed_get = prof.timed("closed", closed_get)
+        goal_test = prof.timed("goal", goal_test)
+        expand = prof.timed("successors", expand)
+        hfun = prof.timed("heuristic", hfun)
+        counters, closed, hooks = prof.counters, prof._closed, prof.hooks
+
+    # lõi -> [(tài nguyên, g)]: các state không bị trội đã sinh (biên Pareto)
+    fronts = None
+    pruned = 0
+    if dominance:
+        dom_key, dominates = problem.dominance_key, problem.dominates
+        core, res = dom_key(start)
+        fronts = {core: [(res, 0.0)]}
+
+    def done(out):
+        if fronts is not None:
+            out["pruned"] = pruned
+        if prof is not None:
+            prof.total += time.perf_counter() - t0
+            closed.clear()
+        return out
 
     while openpq:
         if expanded > max_expanded:
-            return {"solution": None, "actions": [], "cost": float("inf"),
-                    "generated": generated, "expanded": expanded, "reason": "limit"}
+            return done(_stopped("limit", generated, expanded, len(openpq), t0))
+        if expanded % CHECK_EVERY == 0:
+            if cancel is not None and cancel.is_set():
+                return done(_stopped("cancelled", generated, expanded, len(openpq), t0))
+            if deadline is not None and time.perf_counter() >= deadline:
+                return done(_stopped("timeout", generated, expanded, len(openpq), t0))
 
-        _, _, node = heappop(openpq)
-        s = node.state
+        node = pop()
+        s = node.state if codec is None else codec.decode(node.state)
 
-        is_goal = problem.is_goal(s) if goal_fn is None else bool(goal_fn(s))
-        if is_goal:
-            states, actions = reconstruct(node)
-            return {"solution": states, "actions": actions, "cost": node.g,
-                    "generated": generated, "expanded": expanded}
+        if goal_test(s):
+            states, actions = reconstruct(node, codec)
+            return done({"solution": states, "actions": actions, "cost": node.g,
+                         "generated": generated, "expanded": expanded})
 
         expanded += 1
-        try:
-            act_list = list(problem.actions(s))
-        except Exception:
-            act_list = []
-            
-        def _prio(a):
-            return 0 if a in ("TUL","TUR","TBL","TBR") else 1
-        act_list.sort(key=_prio)
-        
-        for a in act_list:
-            try:
-                s2 = problem.result(s, a)
-            except Exception:
-                s2 = None
-            if s2 is None:
-                continue
-
-            try:
-                g2 = node.g + float(problem.step_cost(s, a, s2))
-            except Exception:
-                g2 = node.g + 1.0
+        succ = expand(s)
+        if prof is not None:
+            if graph_search and node.g > best_g.get(node.state, node.g):
+                counters["stale"] += 1
+            closed.add(node.state)
+            for hook in hooks:
+                hook(node, s, succ)
+        for a, s2, cost in succ:
+            g2 = node.g + cost
 
+            k2 = enc(s2)
             if graph_search:
-                old = best_g.get(s2)
+                old = closed_get(k2)
                 if old is not None and g2 >= old:
+                    if prof is not None:
+                        counters["duplicates"] += 1
                     continue
-                best_g[s2] = g2
+                if prof is not None and old is not None and k2 in closed:
+                    counters["reopened"] += 1
+                best_g[k2] = g2
 
-            try:
-                h2 = float(getattr(heuristic, "h", lambda st: 0.0)(s2) or 0.0)
-            except Exception:
-                h2 = 0.0
+            if fronts is not None:
+                core, res = dom_key(s2)
+                front = fronts.setdefault(core, [])
+                if any(g <= g2 and r != res and dominates(r, res) for r, g in front):
+                    pruned += 1
+                    continue
+                front[:] = [(r, g) for r, g in front if not (g2 <= g and dominates(res, r))]
+                front.append((res, g2))
 
-            child = Node(s2, g2, h2, node, a)
-            heappush(openpq, (child.f(), tie, child))
-            tie += 1
+            child = Node(k2, g2, hfun(s2, s), node, a)
+            push(child.f(), child)
             generated += 1
 
-    return {"solution": None, "actions": [], "cost": float("inf"),
-            "generated": generated, "expanded": expanded}
+    return done({"solution": None, "actions": [], "cost": float("inf"),
+                 "generated": generated, "expanded": expanded})
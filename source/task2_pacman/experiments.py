@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, sys, argparse, time, glob
+import os, sys, argparse, time, glob, json, hashlib, platform, statistics, cProfile
 from dataclasses import dataclass
 
 # ==== PATH ====
@@ -10,9 +10,14 @@ if TASK2_DIR not in sys.path:
     sys.path.insert(0, TASK2_DIR)
 
 # ==== PROJECT IMPORTS ====
-from pacman_problem import PacmanProblem, rotate_many, rot_pos_many
+from pacman_problem import PacmanProblem, StateCodec, rotate_many, rot_pos_many
 from heuristics import HeuristicPacmanMST
-from astar import astar
+from astar import astar, OPEN_LISTS, BucketOpenList, SearchProfile
+from focal import focal_search, FOCAL_KEYS
+from memory_bounded import ida_star
+from hda import hda_star
+from macro import MacroProblem
+from tour import plan_tour
 
 # ==== I/O LAYOUT ====
 def load_layout_file(path: str):
@@ -57,9 +62,27 @@ def resolve_layouts(arg_path: str | None):
     raise FileNotFoundError("Không tìm thấy layout. Dùng --layout <file|folder|pattern>.")
 
 # ==== ASTAR WRAPPER ====
-def _run_astar(prob, hz, goal_fn=None, max_expanded=0):
+SEARCHES = ("astar", "focal", "ida")
+
+def _run_astar(prob, hz, goal_fn=None, max_expanded=0, compact=False, search="astar",
+               focal_w=1.5, focal_key="nearest", tt_size=100_000, workers=1, batch=8, macro=False,
+               **search_kw):
+    if macro:
+        # search trên macro-edge (hành lang đã nén); cost vẫn là số bước nguyên thuỷ
+        prob = MacroProblem(prob)
+    if search == "focal":
+        return focal_search(prob, hz, goal_fn=goal_fn, w=focal_w, focal_key=focal_key,
+                            max_expanded=max_expanded, time_limit=search_kw.get("time_limit"))
+    if search == "ida":
+        return ida_star(prob, hz, goal_fn=goal_fn, tt_size=tt_size,
+                        max_expanded=max_expanded, time_limit=search_kw.get("time_limit"))
+    if workers > 1:
+        return hda_star(prob, hz, goal_fn=goal_fn, workers=workers, batch=batch,
+                        max_expanded=max_expanded, time_limit=search_kw.get("time_limit"))
+    codec = StateCodec(getattr(prob, "problem", prob)) if compact else None
     try:
-        return astar(prob, hz, graph_search=True, goal_fn=goal_fn, max_expanded=max_expanded)
+        return astar(prob, hz, graph_search=True, goal_fn=goal_fn, max_expanded=max_expanded, codec=codec,
+                     **search_kw)
     except TypeError:
         try:
             return astar(prob, hz, graph_search=True, goal_fn=goal_fn)
@@ -76,6 +99,15 @@ class RunMetrics:
     expanded: int = 0
     generated: int = 0
     time_ms: float = 0.0
+    mst_hits: int = 0
+    mst_misses: int = 0
+    mst_incremental: int = 0
+    pruned: int = 0
+    solved: bool = False
+    profile: SearchProfile | None = None
+
+def _ratio(a, b):
+    return a / b if b else float("inf")
 
 def _safe(res, key, default=0):
     return res.get(key, default) if isinstance(res, dict) else default
@@ -91,7 +123,28 @@ def apply_destructions_to_grid(grid, destroyed):
             rows[r][c] = ' '
     return ["".join(row) for row in rows]
 
-def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int) -> RunMetrics:
+def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int,
+                 compact: bool = False, mst_cache_size: int = 100_000,
+                 backend: str = "python", open_list: str = "heap",
+                 tie_break: str = "fifo", time_limit: float | None = None,
+                 search: str = "astar", focal_w: float = 1.5, focal_key: str = "nearest",
+                 tt_size: int = 100_000, workers: int = 1, batch: int = 8,
+                 macro: bool = False, dominance: bool = False,
+                 profile: bool = False, cprofile: str | None = None) -> RunMetrics:
+    """
+    profile: đo theo pha mọi đoạn A* (search=astar, workers=1) vào RunMetrics.profile.
+    cprofile: đường dẫn gốc; mỗi đoạn ghi một file pstats <gốc>.segNN<đuôi>.
+    """
+    search_kw = {"open_list": open_list, "tie_break": tie_break, "time_limit": time_limit,
+                 "search": search, "focal_w": focal_w, "focal_key": focal_key, "tt_size": tt_size,
+                 "workers": workers, "batch": batch, "macro": macro}
+    if dominance:
+        if search != "astar" or workers > 1:
+            raise ValueError("dominance chỉ dùng được với search=astar và workers=1")
+        search_kw["dominance"] = True
+    prof = SearchProfile() if profile else None
+    if prof is not None:
+        search_kw["profile"] = prof
     grid_cur = [row[:] for row in grid0]
     R_cur, C_cur = len(grid_cur), len(grid_cur[0])
 
@@ -108,6 +161,39 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
     total_expanded = 0
     total_generated = 0
     total_time_ms = 0.0
+    total_pruned = 0
+    mst_hits = 0
+    mst_misses = 0
+    mst_incremental = 0
+    seg = 0
+
+    def _segment(fn):
+        # chạy một đoạn search, bọc cProfile nếu cần (mỗi đoạn một file)
+        nonlocal seg
+        seg += 1
+        if not cprofile:
+            return fn()
+        pr = cProfile.Profile()
+        pr.enable()
+        try:
+            return fn()
+        finally:
+            pr.disable()
+            root, ext = os.path.splitext(cprofile)
+            os.makedirs(os.path.dirname(os.path.abspath(cprofile)), exist_ok=True)
+            pr.dump_stats(f"{root}.seg{seg:02d}{ext or '.prof'}")
+
+    def _count_mst(hz, res=None):
+        nonlocal mst_hits, mst_misses, mst_incremental
+        mst_hits   += hz.mst_cache.hits
+        mst_misses += hz.mst_cache.misses
+        mst_incremental += hz.mst_incremental
+        if res and "h_stats" in res:
+            # HDA*: phần tra memo trong các tiến trình con
+            hits, misses, inc = res["h_stats"]
+            mst_hits += hits
+            mst_misses += misses
+            mst_incremental += inc
 
     # ---- helper chạy 1 lần A* từ grid_cur với rot_idx0=0 ----
     def _astar_once_eat_one():
@@ -117,8 +203,10 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
         prob = PacmanProblem(grid_cur, cur_pac, cur_foods, cur_exit,
                              pies=cur_pies, ghosts=cur_ghosts,
                              ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
-        hz = HeuristicPacmanMST(prob)
-        return _run_astar(prob, hz, goal_fn=goal_one_food, max_expanded=max_expanded)
+        hz = HeuristicPacmanMST(prob, mst_cache_size=mst_cache_size, backend=backend)
+        res = _run_astar(prob, hz, goal_fn=goal_one_food, max_expanded=max_expanded, compact=compact, **search_kw)
+        _count_mst(hz, res)
+        return res
 
     def _apply_post_segment(last_state):
         nonlocal grid_cur, R_cur, C_cur
@@ -133,7 +221,7 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
     # ---- vòng ăn từng food ----
     while len(cur_foods) > 0:
         t0 = time.perf_counter()
-        res = _astar_once_eat_one()
+        res = _segment(_astar_once_eat_one)
         dt = (time.perf_counter() - t0) * 1000.0
 
         total_time_ms += dt
@@ -143,6 +231,7 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
         total_cost     += float(_safe(res, "cost", 0.0))
         total_expanded += int(_safe(res, "expanded", 0))
         total_generated+= int(_safe(res, "generated", 0))
+        total_pruned   += int(_safe(res, "pruned", 0))
         last = res["solution"][-1]
         cur_pac    = last.pacman
         cur_foods  = list(last.foods)
@@ -164,9 +253,11 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
     prob = PacmanProblem(grid_cur, cur_pac, cur_foods, cur_exit,
                          pies=cur_pies, ghosts=cur_ghosts,
                          ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
-    hz = HeuristicPacmanMST(prob)
+    hz = HeuristicPacmanMST(prob, mst_cache_size=mst_cache_size, backend=backend)
     t0 = time.perf_counter()
-    res = _run_astar(prob, hz, goal_fn=None, max_expanded=max_expanded)
+    res = _segment(lambda: _run_astar(prob, hz, goal_fn=None, max_expanded=max_expanded,
+                                      compact=compact, **search_kw))
+    _count_mst(hz, res)
     dt = (time.perf_counter() - t0) * 1000.0
     total_time_ms += dt
 
@@ -174,45 +265,279 @@ def run_for_food(grid0, start0, foods0, exit0, pies0, ghosts0, max_expanded: int
         total_cost     += float(_safe(res, "cost", 0.0))
         total_expanded += int(_safe(res, "expanded", 0))
         total_generated+= int(_safe(res, "generated", 0))
+        total_pruned   += int(_safe(res, "pruned", 0))
     return RunMetrics(cost=total_cost, expanded=total_expanded,
                       generated=total_generated,
-                      time_ms=total_time_ms)
+                      time_ms=total_time_ms,
+                      mst_hits=mst_hits, mst_misses=mst_misses,
+                      mst_incremental=mst_incremental,
+                      pruned=total_pruned,
+                      solved=bool(res and res.get("solution")), profile=prof)
+
+def run_tour(grid, start, foods, exit_pos, pies, ghosts, max_expanded: int,
+             time_limit: float | None = None):
+    """plan_tour trên toàn layout -> (RunMetrics, kết quả thô để in thứ tự/phương pháp)."""
+    prob = PacmanProblem(grid, start, foods, exit_pos, pies=pies, ghosts=ghosts)
+    t0 = time.perf_counter()
+    res = plan_tour(prob, max_expanded=max_expanded, time_limit=time_limit)
+    dt = (time.perf_counter() - t0) * 1000.0
+    return RunMetrics(cost=float(_safe(res, "cost", 0.0)), expanded=int(_safe(res, "expanded", 0)),
+                      generated=int(_safe(res, "generated", 0)), time_ms=dt,
+                      solved=bool(res.get("solution"))), res
 
 # ==== OUTPUT ====
 OUTPUT_DIR = os.path.join(TASK2_DIR, "output")
 TXT_PATH   = os.path.join(OUTPUT_DIR, "experiments_report.txt")
 
 
-def write_files(layout_path: str, m: RunMetrics):
+def write_files(layout_path: str, m: RunMetrics, append: bool = False):
+    """Một dòng mỗi layout; append=True ghi nối (layout thứ 2 trở đi) thay vì ghi đè."""
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     # TXT
-    with open(TXT_PATH, "w", encoding="utf-8") as f:
+    with open(TXT_PATH, "a" if append else "w", encoding="utf-8") as f:
         f.write(
+            f"layout={os.path.basename(layout_path)} | "
             f"cost={m.cost:.0f} | "
             f"expanded={m.expanded} | "
             f"generated={m.generated} | "
             f"time={m.time_ms:.1f}ms\n"
         )
+# ==== REGRESSION GATE ====
+def layout_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def config_label(args) -> str:
+    """Nhãn cấu hình cho baseline: chỉ các tham số làm đổi search."""
+    parts = [f"search={args.search}", f"open={args.open_list}", f"tie={args.tie_break}",
+             f"backend={args.backend}", f"max_exp={args.max_expanded}"]
+    if args.search == "focal":
+        parts.append(f"focal={args.focal_w}/{args.focal_key}")
+    if args.search == "ida":
+        parts.append(f"tt={args.tt_size}")
+    for flag in ("compact", "macro", "dominance"):
+        if getattr(args, flag):
+            parts.append(flag)
+    if args.workers > 1:
+        parts.append(f"workers={args.workers}/batch={args.batch}")
+    return ",".join(parts)
+
+# độ lệch thời gian tuyệt đối (ms) luôn bỏ qua khi so baseline
+TIME_SLACK_MS = 2.0
+
+def trial_stats(times):
+    """Trung vị + IQR (tứ phân vị 1-3) của thời gian các lần chạy lặp."""
+    xs = sorted(times)
+    if len(xs) >= 2:
+        q1, _, q3 = statistics.quantiles(xs, n=4, method="inclusive")
+    else:
+        q1 = q3 = xs[0]
+    return {"median_ms": statistics.median(xs), "iqr_ms": q3 - q1, "trials": len(xs)}
+
+def record_baseline(path: str, entries: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    doc = {"python": platform.python_version(), "machine": platform.machine(),
+           "recorded": time.strftime("%Y-%m-%d %H:%M:%S"), "entries": entries}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1, ensure_ascii=False)
+    print(f"\nBaseline: wrote {len(entries)} entries -> {path}")
+
+def compare_baseline(path: str, entries: dict, exp_tol: float, time_tol: float) -> int:
+    """
+    So với baseline -> số mục hồi quy.
+    expanded/generated (tất định): hồi quy khi vượt baseline quá exp_tol (tỉ lệ).
+    time: hồi quy khi trung vị mới > trung vị cũ · (1 + time_tol) + 1.5 · IQR cũ + TIME_SLACK_MS
+    (chặn nhiễu đo, nhất là layout chạy vài ms).
+    Kết quả: hồi quy khi baseline giải được mà lần này không, hoặc cost tăng (cost giảm chỉ ghi
+    chú). Kiểm tra này cần thiết vì segment thất bại sớm có expanded ít hơn, qua được ngưỡng trên.
+    Mục không có trong baseline in "new".
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        base = json.load(f)["entries"]
+    failures = 0
+    print(f"\n=== BASELINE CHECK: {path} (exp_tol={exp_tol:.0%}, time_tol={time_tol:.0%}) ===")
+    for key, cur in entries.items():
+        old = base.get(key)
+        if old is None:
+            print(f"[new ] {cur['layout']} | exp={cur['expanded']} | median={cur['median_ms']:.1f}ms")
+            continue
+        bad = []
+        old_solved = old.get("solved", True)    # baseline cũ chưa có cờ này
+        if old_solved and not cur["solved"]:
+            bad.append("solved -> unsolved")
+        elif old_solved and cur["cost"] > old["cost"]:
+            bad.append(f"cost {old['cost']:.0f}->{cur['cost']:.0f}")
+        for k in ("expanded", "generated"):
+            if cur[k] > old[k] * (1.0 + exp_tol):
+                bad.append(f"{k} {old[k]}->{cur[k]} (x{_ratio(cur[k], old[k]):.3f})")
+        limit = old["median_ms"] * (1.0 + time_tol) + 1.5 * old["iqr_ms"] + TIME_SLACK_MS
+        if cur["median_ms"] > limit:
+            bad.append(f"time {old['median_ms']:.1f}->{cur['median_ms']:.1f}ms (limit {limit:.1f}ms)")
+        note = f" | cost {old['cost']:.0f}->{cur['cost']:.0f}" if cur["solved"] and cur["cost"] < old["cost"] else ""
+        status = "FAIL" if bad else "ok  "
+        failures += bool(bad)
+        print(f"[{status}] {cur['layout']} | exp {old['expanded']}->{cur['expanded']} | "
+              f"median {old['median_ms']:.1f}->{cur['median_ms']:.1f}ms "
+              f"(IQR {old['iqr_ms']:.1f}/{cur['iqr_ms']:.1f}){note}"
+              + ("".join(f"\n        {b}" for b in bad)))
+    missing = [k for k in base if k not in entries]
+    if missing:
+        print(f"(baseline có {len(missing)} mục không chạy lần này)")
+    print(f"Regressions: {failures}/{len(entries)}")
+    return failures
+
+def print_scaling(grid, start, foods, exit_pos, pies, ghosts, max_workers, last, run_kw):
+    """Bảng HDA* theo số worker: speedup = T1/Tw, hiệu suất = speedup/w (last = lần chạy với max_workers)."""
+    rows = []
+    for w in range(1, max_workers):
+        rows.append((w, run_for_food(grid, start, foods, exit_pos, pies, ghosts, workers=w, **run_kw)))
+    rows.append((max_workers, last))
+    t1 = rows[0][1].time_ms
+    cpus = os.cpu_count() or 1
+    print(f"HDA* scaling (workers | cost | exp | time | speedup | efficiency), batch={run_kw.get('batch')}, cpus={cpus}:")
+    if cpus < max_workers:
+        print(f"  (chỉ có {cpus} CPU cho {max_workers} worker: các worker chạy xen kẽ, speedup tối đa x{cpus})")
+    for w, m in rows:
+        sp = _ratio(t1, m.time_ms)
+        print(f"  {w:>2} | {m.cost:.0f} | {m.expanded} | {m.time_ms:.1f}ms | x{sp:.2f} | {100.0 * sp / w:.0f}%")
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--layout", default="", help="File | folder | glob pattern (.txt).")
     ap.add_argument("--max-expanded", type=int, default=200000, help="Giới hạn số node expand của mỗi lần A*.")
+    ap.add_argument("--mst-cache", type=int, default=100_000, help="Số MST tối đa giữ trong memo LRU (0 = tắt).")
+    ap.add_argument("--backend", choices=("python", "numpy"), default="python",
+                    help="Kernel BFS/Prim của heuristic; numpy là tuỳ chọn, thiếu thì dùng python.")
+    ap.add_argument("--open-list", choices=OPEN_LISTS, default="heap",
+                    help="Open list của A*: heap nhị phân (mặc định) hoặc bucket queue cho f nguyên.")
+    ap.add_argument("--tie-break", choices=BucketOpenList.TIE_BREAKS, default="fifo",
+                    help="Phá hoà trong cùng tầng f của bucket queue.")
+    ap.add_argument("--time-limit", type=float, default=None, help="Ngân sách thời gian (giây) cho mỗi lần A*.")
+    ap.add_argument("--search", choices=SEARCHES, default="astar",
+                    help="astar (tối ưu) | focal (A*ε, cost ≤ w·tối ưu) | ida (IDA* ít bộ nhớ); "
+                         "focal/ida in thêm so sánh với A*.")
+    ap.add_argument("--focal-w", type=float, default=1.5, help="Hệ số dưới tối ưu w của focal search.")
+    ap.add_argument("--focal-key", choices=tuple(FOCAL_KEYS), default="nearest",
+                    help="Tiêu chí phụ chọn node trong FOCAL.")
+    ap.add_argument("--tt-size", type=int, default=100_000,
+                    help="Số state tối đa trong bảng chuyển vị của IDA* (giới hạn bộ nhớ).")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Số tiến trình HDA* cho search=astar (1 = tuần tự); in hiệu suất mở rộng cho 1..N.")
+    ap.add_argument("--batch", type=int, default=8,
+                    help="HDA*: số node tối đa mỗi lô gửi giữa worker, cũng là số expand giữa hai lần đọc hộp thư.")
+    ap.add_argument("--compact", action="store_true", help="Lưu state dạng bitmask (StateCodec) trong A*.")
+    ap.add_argument("--macro", action="store_true",
+                    help="Search trên macro-edge: nén hành lang giữa các điểm quyết định (MacroProblem).")
+    ap.add_argument("--dominance", action="store_true",
+                    help="Closed list trội của A*: bỏ state cùng lõi (kể cả tường đã phá) có ttl nhỏ hơn và g không tốt hơn. "
+                         "Chỉ với --search astar và --workers 1.")
+    ap.add_argument("--tour", action="store_true",
+                    help="Chạy thêm planner theo thứ tự food toàn cục (tour.py) và so với chuỗi tham lam.")
+    ap.add_argument("--profile", action="store_true",
+                    help="In thời gian theo pha của A* (goal/successors/heuristic/heap/closed) và bộ đếm.")
+    ap.add_argument("--cprofile", metavar="OUT.prof", default=None,
+                    help="Ghi file cProfile/pstats cho từng đoạn search: OUT.segNN.prof (nhiều layout: OUT.<layout>.segNN.prof).")
+    ap.add_argument("--record-baseline", metavar="FILE", default=None,
+                    help="Ghi baseline (expanded/generated/thời gian theo layout × cấu hình) ra FILE (.json).")
+    ap.add_argument("--check-baseline", metavar="FILE", default=None,
+                    help="So với baseline FILE; có hồi quy thì thoát mã 1.")
+    ap.add_argument("--trials", type=int, default=5,
+                    help="Số lần chạy lặp (sau một lần làm nóng) để đo thời gian trung vị/IQR khi ghi/so baseline; mặc định 5.")
+    ap.add_argument("--exp-threshold", type=float, default=0.0,
+                    help="Tỉ lệ tăng expanded/generated cho phép so với baseline (0.02 = 2%%).")
+    ap.add_argument("--time-threshold", type=float, default=0.25,
+                    help="Tỉ lệ tăng thời gian trung vị cho phép (cộng thêm 1.5·IQR của baseline).")
     args = ap.parse_args()
+    if args.dominance and (args.search != "astar" or args.workers > 1):
+        ap.error("--dominance chỉ dùng được với --search astar và --workers 1")
+
+    gate = args.record_baseline or args.check_baseline
+    trials = max(1, args.trials)
+    label = config_label(args)
+    entries = {}
 
     layouts = resolve_layouts(args.layout)
-    for lay in layouts:
+    for i, lay in enumerate(layouts):
         grid = load_layout_file(lay)
         start, foods, exit_pos, pies, ghosts = parse_layout(grid)
         print(f"\n=== LAYOUT: {lay} ===")
         print(f"Grid: {len(grid)}x{len(grid[0])} | foods={len(foods)} pies={len(pies)} ghosts={len(ghosts)}")
-        print(f"algo=A*-MST | max_expanded={args.max_expanded}")
-        met = run_for_food(grid, start, foods, exit_pos, pies, ghosts,
-                                     max_expanded=args.max_expanded)
+        print(f"algo=A*-MST | max_expanded={args.max_expanded} | compact={args.compact} | backend={args.backend} | open={args.open_list} | search={args.search} | macro={args.macro}")
+        run_kw = dict(max_expanded=args.max_expanded, compact=args.compact,
+                      mst_cache_size=args.mst_cache, backend=args.backend,
+                      open_list=args.open_list, tie_break=args.tie_break,
+                      time_limit=args.time_limit, macro=args.macro,
+                      dominance=args.dominance, batch=args.batch)
+        cprof = args.cprofile
+        if cprof and len(layouts) > 1:
+            root, ext = os.path.splitext(cprof)
+            cprof = f"{root}.{os.path.splitext(os.path.basename(lay))[0]}{ext}"
+        met = run_for_food(grid, start, foods, exit_pos, pies, ghosts, search=args.search,
+                           focal_w=args.focal_w, focal_key=args.focal_key, tt_size=args.tt_size,
+                           workers=args.workers if args.search == "astar" else 1,
+                           profile=args.profile, cprofile=cprof, **run_kw)
         print(f"Done: cost={met.cost:.0f} | exp={met.expanded} | gen={met.generated} | time={met.time_ms:.1f}ms", flush=True)
+        if gate:
+            # lần đầu làm nóng cache dùng chung (bảng khoảng cách, timeline...), chỉ đo các lần lặp sau;
+            # expanded là tín hiệu ổn định nên lấy lần đầu
+            times = []
+            for _ in range(trials):
+                times.append(run_for_food(grid, start, foods, exit_pos, pies, ghosts, search=args.search,
+                                          focal_w=args.focal_w, focal_key=args.focal_key, tt_size=args.tt_size,
+                                          workers=args.workers if args.search == "astar" else 1,
+                                          **run_kw).time_ms)
+            st = trial_stats(times)
+            print(f"Trials: n={st['trials']} | median={st['median_ms']:.1f}ms | IQR={st['iqr_ms']:.1f}ms")
+            entries[f"{layout_hash(lay)}|{label}"] = dict(
+                layout=os.path.relpath(lay, TASK2_DIR), config=label, solved=met.solved, cost=met.cost,
+                expanded=met.expanded, generated=met.generated, **st)
+        if args.search != "astar":
+            ref = run_for_food(grid, start, foods, exit_pos, pies, ghosts, search="astar", **run_kw)
+            name = (f"focal(w={args.focal_w}, key={args.focal_key})" if args.search == "focal"
+                    else f"ida(tt={args.tt_size})")
+            print(f"{name} vs A*: "
+                  f"cost {met.cost:.0f}/{ref.cost:.0f} (x{_ratio(met.cost, ref.cost):.3f}) | "
+                  f"exp {met.expanded}/{ref.expanded} (x{_ratio(met.expanded, ref.expanded):.3f}) | "
+                  f"time {met.time_ms:.1f}/{ref.time_ms:.1f}ms")
+        if args.search == "astar" and args.workers > 1:
+            print_scaling(grid, start, foods, exit_pos, pies, ghosts, args.workers, met, run_kw)
+        lookups = met.mst_hits + met.mst_misses
+        rate = 100.0 * met.mst_hits / lookups if lookups else 0.0
+        print(f"MST memo: hits={met.mst_hits} | misses={met.mst_misses} | hit_rate={rate:.1f}% | incremental={met.mst_incremental}")
 
-        write_files(lay, met)
+        if args.tour:
+            tm, tres = run_tour(grid, start, foods, exit_pos, pies, ghosts, args.max_expanded, args.time_limit)
+            print(f"Tour ({tres.get('method')}, estimate={tres.get('tour_estimate')}): "
+                  f"cost={tm.cost:.0f} | exp={tm.expanded} | gen={tm.generated} | time={tm.time_ms:.1f}ms")
+            print(f"tour vs greedy: "
+                  f"cost {tm.cost:.0f}/{met.cost:.0f} (x{_ratio(tm.cost, met.cost):.3f}) | "
+                  f"exp {tm.expanded}/{met.expanded} (x{_ratio(tm.expanded, met.expanded):.3f}) | "
+                  f"time {tm.time_ms:.1f}/{met.time_ms:.1f}ms")
+        if args.dominance:
+            print(f"Dominance: pruned={met.pruned}")
+        if args.profile:
+            if met.profile is not None and met.profile.total > 0:
+                print(f"Profile (A*, total={met.profile.total * 1000.0:.1f}ms, gồm chi phí đo):")
+                for line in met.profile.lines():
+                    print(f"  {line}")
+            else:
+                print("Profile: chỉ đo được khi --search astar và --workers 1.")
+        if cprof:
+            print(f"cProfile: {os.path.splitext(cprof)[0]}.segNN{os.path.splitext(cprof)[1] or '.prof'} "
+                  f"(xem bằng: python -m pstats <file>)")
+
+        write_files(lay, met, append=i > 0)
         print(f"Wrote TXT: {TXT_PATH}")
 
+    if args.record_baseline:
+        record_baseline(args.record_baseline, entries)
+    if args.check_baseline:
+        if not os.path.isfile(args.check_baseline):
+            print(f"Không tìm thấy baseline: {args.check_baseline}")
+            sys.exit(2)
+        if compare_baseline(args.check_baseline, entries, args.exp_threshold, args.time_threshold):
+            sys.exit(1)
+
 if __name__ == "__main__":
     main()
     
\ No newline at end of file
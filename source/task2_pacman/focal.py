@@ -0,0 +1,98 @@
+import time
+from heapq import heappush, heappop
+
+from astar import Node, reconstruct, successor_fn, heuristic_fn, _stopped, CHECK_EVERY
+
+# ---------- Tiêu chí phụ chọn node trong FOCAL ----------
+def _key_foods(heuristic):
+    return lambda node: len(node.state.foods)
+
+def _key_nearest(heuristic):
+    near = getattr(heuristic, "nearest_food", None)
+    if near is None:
+        def near(s):
+            pr, pc = s.pacman
+            return min((abs(pr - r) + abs(pc - c) for r, c in s.foods), default=0)
+    return lambda node: (len(node.state.foods), near(node.state))
+
+def _key_h(heuristic):
+    return lambda node: node.h
+
+FOCAL_KEYS = {"foods": _key_foods, "nearest": _key_nearest, "h": _key_h}
+
+def focal_search(problem, heuristic, goal_fn=None, w=1.5, focal_key="nearest",
+                 max_expanded=200000, time_limit=None, cancel=None):
+    """
+    Focal search (A*ε): FOCAL = {n ∈ OPEN : f(n) ≤ w · f_min}; luôn expand node có tiêu chí phụ
+    nhỏ nhất trong FOCAL (focal_key: "foods" | "nearest" | "h"), hoà thì f nhỏ hơn.
+    Với h chấp nhận được, cost ≤ w · tối ưu. Kết quả cùng định dạng astar (+ "weight").
+    """
+    if focal_key not in FOCAL_KEYS:
+        raise ValueError(f"focal_key phải thuộc {tuple(FOCAL_KEYS)}")
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit if time_limit is not None else None
+    hfun = heuristic_fn(heuristic)
+    expand = successor_fn(problem)
+    secondary = FOCAL_KEYS[focal_key](heuristic)
+    is_goal = problem.is_goal if goal_fn is None else (lambda st: bool(goal_fn(st)))
+    w = max(1.0, float(w))
+
+    start = problem.initial_state()
+    root = Node(start, 0.0, hfun(start), None, None)
+    open_f = [(root.f(), 0, root)]      # toàn bộ OPEN theo f (xoá lười) -> f_min
+    pending = [(root.f(), 0, root)]     # OPEN chưa vào FOCAL, theo f
+    focal = []                          # (tiêu chí phụ, f, tie, node)
+    done = set()                        # tie của node đã lấy khỏi OPEN
+    best_g = {start: 0.0}
+    tie = 1
+    expanded = 0
+    generated = 1
+
+    while open_f:
+        if expanded > max_expanded:
+            return _stopped("limit", generated, expanded, len(open_f), t0)
+        if expanded % CHECK_EVERY == 0:
+            if cancel is not None and cancel.is_set():
+                return _stopped("cancelled", generated, expanded, len(open_f), t0)
+            if deadline is not None and time.perf_counter() >= deadline:
+                return _stopped("timeout", generated, expanded, len(open_f), t0)
+
+        while open_f and open_f[0][1] in done:
+            heappop(open_f)
+        if not open_f:
+            break
+        limit = w * open_f[0][0]
+        while pending and pending[0][0] <= limit:
+            f, t, n = heappop(pending)
+            heappush(focal, (secondary(n), f, t, n))
+
+        _, _, t, node = heappop(focal)
+        done.add(t)
+        s = node.state
+        if node.g > best_g.get(s, node.g):
+            continue  # đã có đường tốt hơn tới s
+
+        if is_goal(s):
+            states, actions = reconstruct(node)
+            return {"solution": states, "actions": actions, "cost": node.g,
+                    "generated": generated, "expanded": expanded, "weight": w}
+
+        expanded += 1
+        for a, s2, cost in expand(s):
+            g2 = node.g + cost
+            old = best_g.get(s2)
+            if old is not None and g2 >= old:
+                continue
+            best_g[s2] = g2
+            child = Node(s2, g2, hfun(s2, s), node, a)
+            f2 = child.f()
+            heappush(open_f, (f2, tie, child))
+            if f2 <= limit:
+                heappush(focal, (secondary(child), f2, tie, child))
+            else:
+                heappush(pending, (f2, tie, child))
+            tie += 1
+            generated += 1
+
+    return {"solution": None, "actions": [], "cost": float("inf"),
+            "generated": generated, "expanded": expanded, "weight": w}
@@ -20,6 +20,10 @@ CELL_LOGICAL = 32
 HUD_H = 84
 FPS = 60
 AUTO_STEP_COOLDOWN_FRAMES = 6
+PLAN_TIME_LIMIT_S = 10.0   # ngân sách thời gian cho mỗi lần lập kế hoạch
+PLAN_ANYTIME = True        # replan nền bằng ARA*: đi theo lời giải đầu, nhận bản tốt hơn khi chưa bước
+PLAN_INCREMENTAL = True    # giữ problem/heuristic giữa các lần replan, dùng lại phần còn lại của lời giải cũ
+PLAN_MACRO = False         # search trên macro-edge (hành lang đã nén) thay vì từng ô
 
 # ---- COLORS ----
 COLOR_BG        = (10, 10, 10)
@@ -1,6 +1,8 @@
 import threading, pygame
 from .config import (FPS, AUTO_STEP_COOLDOWN_FRAMES, SPRITE_SIZE, ASSETS_DIR,
-                     COLOR_BG, CELL_LOGICAL, HUD_H, resolve_layout_path)
+                     COLOR_BG, CELL_LOGICAL, HUD_H, PLAN_TIME_LIMIT_S, PLAN_ANYTIME,
+                     PLAN_INCREMENTAL, PLAN_MACRO,
+                     resolve_layout_path)
 from .assets import AssetManager
 from .render import Renderer
 from .layout import load_layout_file, parse_grid, corner_anchors, is_at_anchor
@@ -28,12 +30,24 @@ class PacmanGame:
         self.plan_thread = None
         self.plan_done = False
         self.plan_result = []
+        self.plan_cancel = None  # threading.Event của lần replan đang chạy
 
         self.run_actions_history = []
         self.run_coords_history  = []
         self.game_complete = False
 
+    def cancel_replan(self):
+        # báo A* nền dừng và quên kết quả của nó; lần replan sau có thể chạy ngay
+        if self.plan_cancel is not None:
+            self.plan_cancel.set()
+        self.plan_cancel = None
+        self.planning_busy = False
+        self.plan_thread = None
+        self.plan_done = False
+        self.plan_result = []
+
     def reset_game_state(self):
+        self.cancel_replan()
         self.grid = load_layout_file(self.layout_path)
         start, foods, exit_pos, pies, ghosts = parse_grid(self.grid)
         self.pac = list(start)
@@ -66,16 +80,29 @@ class PacmanGame:
         snap_exit   = self.exit_pos
         snap_ttl    = self.ttl
         snap_step   = self.step_mod
+        if self.plan_cancel is not None:
+            self.plan_cancel.set()  # bỏ phần tinh chỉnh của lần replan trước
+        token = threading.Event()
+        self.plan_cancel = token
+
+        def _publish(acts, *_):
+            if token.is_set() or self.plan_cancel is not token:
+                return  # replan đã bị huỷ (reset / tắt AUTO)
+            self.plan_result = list(acts)
+            self.plan_done = True
 
         def _worker():
             try:
                 acts, _, _ = self.plan.plan_one_goal(
-                    snap_grid, snap_pac, snap_foods, snap_pies, snap_ghosts, snap_exit, snap_ttl, snap_step
+                    snap_grid, snap_pac, snap_foods, snap_pies, snap_ghosts, snap_exit, snap_ttl, snap_step,
+                    time_limit=PLAN_TIME_LIMIT_S, cancel=token,
+                    anytime=PLAN_ANYTIME, on_solution=_publish, incremental=PLAN_INCREMENTAL,
+                    macro=PLAN_MACRO
                 )
             except Exception:
                 acts = []
-            self.plan_result = acts
-            self.plan_done = True
+            if not (PLAN_ANYTIME and acts):
+                _publish(acts)
 
         t = threading.Thread(target=_worker, daemon=True)
         self.plan_thread = t
@@ -118,6 +145,7 @@ class PacmanGame:
 
                     # toggle auto
                     if event.key == pygame.K_a:
+                        self.cancel_replan()
                         self.auto_mode = not self.auto_mode
                         self.auto_step_cooldown = 0
                         self.auto_actions = []
@@ -127,7 +155,8 @@ class PacmanGame:
                             try:
                                 actions, coords, total_cost = self.plan.plan_one_goal(
                                     self.grid, self.pac, self.foods, self.pies, self.ghosts,
-                                    self.exit_pos, self.ttl, self.step_mod
+                                    self.exit_pos, self.ttl, self.step_mod,
+                                    time_limit=PLAN_TIME_LIMIT_S, incremental=PLAN_INCREMENTAL, macro=PLAN_MACRO
                                 )
                                 if not actions:
                                     print("[AUTO] No plan.")
@@ -207,7 +236,15 @@ class PacmanGame:
                     if acts:
                         if self.auto_step_cooldown > 0:
                             self.auto_step_cooldown -= 1
+                            # ARA* vẫn đang tinh chỉnh và chưa đi bước nào: nhận lời giải tốt hơn
+                            if self.plan_cancel is not None and self.plan_done and self.plan_result:
+                                self.auto_actions = acts = list(self.plan_result)
+                                self.plan_done = False
                         else:
+                            if self.plan_cancel is not None:
+                                # bắt đầu đi theo kế hoạch -> dừng tinh chỉnh để nhả CPU
+                                self.plan_cancel.set()
+                                self.plan_cancel = None
                             a = acts.pop(0)
                             before = tuple(self.pac)
                             (self.grid, self.pac, self.foods, self.pies, self.ghosts, self.exit_pos,
@@ -1,4 +1,5 @@
 from typing import List, Tuple, Set
+from functools import lru_cache
 from .config import CELL_LOGICAL
 import pygame
 
@@ -90,16 +91,22 @@ def first_open_from_bottom_right(grid):
                 return (r, c)
     return (R-1, C-1)
 
-def corner_anchors(grid):
-    return (
-        first_open_from_top_left(grid),
-        first_open_from_top_right(grid),
-        first_open_from_bottom_left(grid),
-        first_open_from_bottom_right(grid)
+# grid của GUI bị sửa tại chỗ khi ăn tường -> cache theo nội dung (tuple các hàng)
+@lru_cache(maxsize=64)
+def _corner_anchors_cached(grid_key: Tuple[str, ...]):
+    anchors = (
+        first_open_from_top_left(grid_key),
+        first_open_from_top_right(grid_key),
+        first_open_from_bottom_left(grid_key),
+        first_open_from_bottom_right(grid_key)
     )
+    return anchors, frozenset(anchors)
+
+def corner_anchors(grid):
+    return _corner_anchors_cached(tuple(grid))[0]
 
 def is_at_anchor(grid, pac):
-    return tuple(pac) in set(corner_anchors(grid))
+    return tuple(pac) in _corner_anchors_cached(tuple(grid))[1]
 
 def make_logical_surface(grid: List[str], hud_h: int):
     w = len(grid[0]) * CELL_LOGICAL
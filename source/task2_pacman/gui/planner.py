@@ -1,18 +1,52 @@
 from astar import astar
+from anytime import ara_star
+from incremental import IncrementalPlanner
+from macro import MacroProblem, expand
 from heuristics import HeuristicPacmanMST
 from pacman_problem import PacmanProblem
+from tour import plan_tour
 
-def _run_astar_safe(problem, hz, goal_fn=None, max_expanded=200000):
+def _run_astar_safe(problem, hz, goal_fn=None, max_expanded=200000, **search_kw):
     try:
         try:
-            res = astar(problem, hz, graph_search=True, goal_fn=goal_fn, max_expanded=max_expanded)
+            res = astar(problem, hz, graph_search=True, goal_fn=goal_fn, max_expanded=max_expanded, **search_kw)
         except TypeError:
             res = astar(problem, hz, graph_search=True, goal_fn=goal_fn)
     except Exception as e:
         print("[A*] Exception:", e)
         return {}
+    if isinstance(res, dict) and res.get("reason") in ("timeout", "cancelled"):
+        print(f"[A*] {res['reason']}: exp={res.get('expanded')} | gen={res.get('generated')} | "
+              f"time={res.get('time_ms', 0.0):.1f}ms")
     return res if isinstance(res, dict) else {}
 
+def _run_anytime_safe(problem, hz, goal_fn=None, on_solution=None, max_expanded=200000, **search_kw):
+    try:
+        res = ara_star(problem, hz, goal_fn=goal_fn, on_solution=on_solution,
+                       max_expanded=max_expanded, **search_kw)
+    except Exception as e:
+        print("[ARA*] Exception:", e)
+        return {}
+    return res if isinstance(res, dict) else {}
+
+def _run_tour_safe(problem, max_expanded=200000, **search_kw):
+    try:
+        res = plan_tour(problem, max_expanded=max_expanded, **search_kw)
+    except Exception as e:
+        print("[TOUR] Exception:", e)
+        return {}
+    if isinstance(res, dict) and res.get("reason") in ("timeout", "cancelled"):
+        print(f"[TOUR] {res['reason']}: exp={res.get('expanded')} | gen={res.get('generated')}")
+    return res if isinstance(res, dict) else {}
+
+def _unpack(res):
+    """res của search -> (actions, coords, cost)."""
+    if not res or not res.get("solution"):
+        return [], [], 0.0
+    states, actions = res["solution"], res["actions"]
+    coords = [s.pacman for s in states[1:] if s is not None]
+    return (actions or []), coords, float(res.get("cost", 0.0))
+
 def _to_pos(x):
     try:
         r,c = x
@@ -58,69 +92,59 @@ def sanitize_inputs(grid, pac, foods, pies, ghosts, exit_pos):
 
 class PlanService:
     """Gói toàn bộ logic lập kế hoạch (one-goal + full)."""
-    def plan_full(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step_mod):
+    def __init__(self):
+        self.incremental = IncrementalPlanner()
+
+    def plan_full(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step_mod,
+                  time_limit=None, cancel=None, tour=False):
+        """
+        Kế hoạch cả màn: mặc định chuỗi tham lam "food gần nhất trước" (plan_tour greedy=True).
+        tour=True: thứ tự food toàn cục của tour.py; ma trận của nó bỏ qua pie/ăn tường nên trên
+        map có pie có thể đắt hơn (map mẫu: 149 so với 131).
+        """
         try:
             pac, foods, pies, ghosts, exit_pos = sanitize_inputs(grid, pac, foods, pies, ghosts, exit_pos)
-
-            cur_grid   = list(grid)
-            cur_pac    = tuple(pac)
-            cur_foods  = sorted(list(foods))
-            cur_pies   = sorted(list(pies))
-            cur_ghosts = [(tuple(pos), d) for (pos, d) in ghosts]
-            cur_exit   = exit_pos
             cur_ttl    = int(ttl) if isinstance(ttl, int) else 0
             cur_step   = int(step_mod) % 30 if isinstance(step_mod, int) else 0
-
-            total_actions,total_coords,total_cost = [],[],0.0
-
-            while True:
-                if len(cur_foods) == 0:
-                    prob = PacmanProblem(cur_grid, cur_pac, cur_foods, cur_exit,
-                                         pies=cur_pies, ghosts=cur_ghosts,
-                                         ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
-                    hz = HeuristicPacmanMST(prob)
-                    res = _run_astar_safe(prob, hz, goal_fn=None)
-
-                    if not res or not res.get("solution"):
-                        return total_actions, total_coords, total_cost
-
-                    states, actions = res["solution"], res["actions"]
-                    for s in states[1:]:
-                        if s is not None: total_coords.append(s.pacman)
-                    total_actions.extend(actions or [])
-                    total_cost += float(res.get("cost", 0.0))
-                    return total_actions, total_coords, total_cost
-
-                best=None
-                target_count_after = len(cur_foods)-1
-                def goal_fn(s, target_count=target_count_after):
-                    return (s is not None) and (len(s.foods) == target_count)
-                if best is None:
-                    return total_actions, total_coords, total_cost
-
-                _, res = best
-                states, actions = res["solution"], res["actions"]
-                for s in states[1:]:
-                    if s is not None: total_coords.append(s.pacman)
-                total_actions.extend(actions or [])
-                total_cost += float(res.get("cost", 0.0))
-
-                s_last = states[-1] if states else None
-                if s_last is None:
-                    return total_actions, total_coords, total_cost
-
-                cur_pac    = s_last.pacman
-                cur_foods  = list(s_last.foods)
-                cur_pies   = list(s_last.pies)
-                cur_ghosts = [(g.pos, g.dir) for g in s_last.ghosts]
-                cur_ttl    = s_last.ttl
-                cur_step   = s_last.steps_mod30
+            prob = PacmanProblem(list(grid), tuple(pac), sorted(foods), exit_pos,
+                                 pies=sorted(pies), ghosts=[(tuple(pos), d) for (pos, d) in ghosts],
+                                 ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
+            return _unpack(_run_tour_safe(prob, time_limit=time_limit, cancel=cancel, greedy=not tour))
 
         except Exception as e:
             print("[PLAN] Exception in plan_full:", e)
             return [], [], 0.0
 
-    def plan_one_goal(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step_mod):
+    def _search(self, prob, hz, goal_fn, time_limit, cancel, anytime, on_solution, macro=False):
+        """
+        Một lần lập kế hoạch trên prob -> dict kết quả của search.
+        macro=True: search trên MacroProblem (hành lang đã nén); kết quả (kể cả lời giải báo qua
+        on_solution) được bung về từng bước N/S/E/W.
+        """
+        if hz is None:
+            hz = HeuristicPacmanMST(prob)
+        space = MacroProblem(prob) if macro else prob
+        prim = (lambda res: expand(prob, res)) if macro else (lambda res: res)
+        if not anytime:
+            return prim(_run_astar_safe(space, hz, goal_fn=goal_fn, time_limit=time_limit, cancel=cancel))
+
+        def _report(res):
+            if on_solution is not None:
+                on_solution(*_unpack(prim(res)), res.get("bound"))
+        return prim(_run_anytime_safe(space, hz, goal_fn=goal_fn, on_solution=_report,
+                                      time_limit=time_limit, cancel=cancel))
+
+    def plan_one_goal(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step_mod,
+                      time_limit=None, cancel=None, anytime=False, on_solution=None, incremental=False,
+                      macro=False):
+        """
+        time_limit (giây) / cancel (threading.Event): replan cũ bỏ ngay thay vì chạy tiếp.
+        anytime=True: chạy ARA*; mỗi lời giải tốt hơn gọi on_solution(actions, coords, cost, bound)
+        ngay khi có (lời giải đầu dùng được luôn), giá trị trả về là lời giải cuối cùng.
+        incremental=True: dùng IncrementalPlanner giữ problem/heuristic giữa các lần gọi, trả luôn
+        phần còn lại của lời giải trước nếu Pacman vẫn đi đúng nó.
+        macro=True: search trên macro-edge (xem MacroProblem), kế hoạch trả ra vẫn theo từng bước.
+        """
         try:
             pac, foods, pies, ghosts, exit_pos = sanitize_inputs(grid, pac, foods, pies, ghosts, exit_pos)
 
@@ -133,30 +157,32 @@ class PlanService:
             cur_ttl    = int(ttl) if isinstance(ttl, int) else 0
             cur_step   = int(step_mod) % 30 if isinstance(step_mod, int) else 0
 
-            if len(cur_foods) == 0:
+            goal_fn = None
+            if len(cur_foods) > 0:
+                target_count_after = len(cur_foods) - 1
+                def goal_fn(s, target_count=target_count_after):
+                    return (s is not None) and (len(s.foods) == target_count)
+
+            if not incremental:
                 prob = PacmanProblem(cur_grid, cur_pac, cur_foods, cur_exit,
                                      pies=cur_pies, ghosts=cur_ghosts,
                                      ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
-                hz = HeuristicPacmanMST(prob)
-                res = _run_astar_safe(prob, hz, goal_fn=None)
-                if not res or not res.get("solution"): return [], [], 0.0
-                states, actions = res["solution"], res["actions"]
-                coords = [s.pacman for s in states[1:] if s is not None]
-                return (actions or []), coords, float(res.get("cost", 0.0))
-
-            target_count_after = len(cur_foods) - 1
-            def goal_fn(s, target_count=target_count_after):
-                return (s is not None) and (len(s.foods) == target_count)
-
-            prob = PacmanProblem(cur_grid, cur_pac, cur_foods, cur_exit,
-                                 pies=cur_pies, ghosts=cur_ghosts,
-                                 ttl0=cur_ttl, steps_mod30_0=cur_step, rot_idx0=0)
-            hz = HeuristicPacmanMST(prob)
-            res = _run_astar_safe(prob, hz, goal_fn=goal_fn)
-            if not res or not res.get("solution"): return [], [], 0.0
-            states, actions = res["solution"], res["actions"]
-            coords = [s.pacman for s in states[1:] if s is not None]
-            return (actions or []), coords, float(res.get("cost", 0.0))
+                return _unpack(self._search(prob, None, goal_fn, time_limit, cancel, anytime, on_solution, macro))
+
+            inc = self.incremental
+            with inc.lock:
+                prob, hz, suffix = inc.prepare(cur_grid, cur_pac, cur_foods, cur_pies, cur_ghosts,
+                                               cur_exit, cur_ttl, cur_step, goal_fn=goal_fn)
+                if suffix is not None:
+                    # vẫn trên lời giải trước, đích chưa đổi: dùng phần còn lại, không search
+                    actions, states = suffix
+                    out = _unpack({"solution": states, "actions": actions, "cost": float(len(actions))})
+                    if anytime and on_solution is not None:
+                        on_solution(*out, 1.0)
+                    return out
+                res = self._search(prob, hz, goal_fn, time_limit, cancel, anytime, on_solution, macro)
+                inc.commit(res)
+                return _unpack(res)
 
         except Exception as e:
             print("[PLAN-ONE] Exception:", e)
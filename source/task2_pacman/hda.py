@@ -0,0 +1,293 @@
+import time
+import queue
+import multiprocessing as mp
+from heapq import heappush, heappop
+
+from astar import astar, successor_fn, heuristic_fn, _stopped
+from pacman_problem import StateCodec
+
+INF = float("inf")
+
+# khoảng nghỉ (giây) giữa hai vòng probe của tiến trình điều phối
+PROBE_INTERVAL = 0.002
+
+def _owner(key, workers):
+    # key là tuple số nguyên (StateCodec): hash không phụ thuộc hash seed của tiến trình
+    return hash(key) % workers
+
+def _h_stats(heuristic):
+    """Bộ đếm memo MST của heuristic (nếu có) -> (hits, misses, incremental)."""
+    cache = getattr(heuristic, "mst_cache", None)
+    if cache is None:
+        return (0, 0, 0)
+    return (cache.hits, cache.misses, getattr(heuristic, "mst_incremental", 0))
+
+# ---------- Worker ----------
+def _worker(wid, workers, problem, heuristic, goal_fn, inboxes, status, batch):
+    """
+    Sở hữu các state có _owner(key) == wid, key = StateCodec.encode(s). Hộp thư nhận:
+      ("nodes", [(key, g, h, m, parent, action)]) | ("inc", (m, f)) | ("probe", wave)
+      | ("trace", i) | ("stop",)
+    Gửi về status: ("goal", m, f, cost, (wid, i)) | ("probe", wave, wid, sent, recv, idle, exp, gen)
+                   | ("trace", actions, parent) | ("final", wid, exp, gen, h_stats)
+    Node chỉ mang key + g + tham chiếu cha (wid, i) + action cuối, không mang cả chuỗi action:
+    mỗi worker giữ bảng cha cục bộ (i -> (parent, action)), đường đi dựng lại bằng "trace" lúc cuối.
+    State chỉ được decode khi pop để expand.
+    m là f lớn nhất dọc đường từ gốc (pathmax). h không nhất quán nên astar tuần tự pop node theo
+    m trước rồi mới theo f: goal nó trả là goal có (m, f) nhỏ nhất. Open list và incumbent vì vậy
+    xếp theo (m, f); cắt theo g (h(goal) > 0 ở đoạn "ăn 1 food") hay chỉ theo f đều lệch cost.
+    batch: số node tối đa mỗi lô gửi đi, cũng là số expand giữa hai lần đọc hộp thư khi bận.
+    """
+    for q in inboxes:
+        q.cancel_join_thread()   # dừng sớm thì bỏ node còn trong ống, không treo lúc thoát
+    hfun = heuristic_fn(heuristic)
+    h0 = _h_stats(heuristic)    # bộ đếm lúc fork (đã tính ở tiến trình cha)
+    expand = successor_fn(problem)
+    is_goal = problem.is_goal if goal_fn is None else (lambda st: bool(goal_fn(st)))
+    codec = StateCodec(getattr(problem, "problem", problem), ghost_phase=False)
+    encode, decode = codec.encode, codec.decode
+    inbox = inboxes[wid]
+
+    openpq, best_g, links = [], {}, []
+    out = [[] for _ in range(workers)]
+    incumbent = (INF, INF)
+    sent = recv = 0
+    expanded = generated = 0
+
+    def push(key, g, h, m, parent, action):
+        old = best_g.get(key)
+        if old is not None and g >= old:
+            return
+        best_g[key] = g
+        heappush(openpq, (m, g + h, -g, len(links), key))   # hoà thì g lớn trước như astar
+        links.append((parent, action))
+
+    def flush(force):
+        nonlocal sent
+        for j, buf in enumerate(out):
+            if buf and (force or len(buf) >= batch):
+                inboxes[j].put(("nodes", buf))
+                out[j] = []
+                sent += 1
+
+    def busy():
+        return bool(openpq) and openpq[0][:2] < incumbent
+
+    def trace(i):
+        # lùi theo bảng cha tới khi cha nằm ở worker khác (hoặc tới gốc)
+        acts = []
+        while True:
+            parent, action = links[i]
+            if action is None:
+                return acts, None
+            acts.append(action)
+            if parent[0] != wid:
+                return acts, parent
+            i = parent[1]
+
+    while True:
+        # ---- đọc hộp thư: chờ khi rảnh, không chờ khi đang bận ----
+        while True:
+            try:
+                msg = inbox.get(timeout=0.05) if not busy() else inbox.get_nowait()
+            except queue.Empty:
+                break
+            kind = msg[0]
+            if kind == "nodes":
+                recv += 1
+                for item in msg[1]:
+                    push(*item)
+            elif kind == "inc":
+                incumbent = min(incumbent, msg[1])
+            elif kind == "probe":
+                idle = not busy() and not any(out)
+                status.put(("probe", msg[1], wid, sent, recv, idle, expanded, generated))
+                if not idle:
+                    break   # đang bận: đi expand, không trả lời probe liên tục
+            elif kind == "trace":
+                status.put(("trace", *trace(msg[1])))
+            else:
+                status.put(("final", wid, expanded, generated,
+                            tuple(a - b for a, b in zip(_h_stats(heuristic), h0))))
+                return
+
+        # ---- expand tối đa batch node rồi quay lại hộp thư ----
+        for _ in range(batch):
+            if not busy():
+                break
+            m, f, neg_g, i, key = heappop(openpq)
+            g = -neg_g
+            if g > best_g[key]:
+                continue    # mục cũ, đã có đường tốt hơn
+            s = decode(key)
+            if is_goal(s):
+                incumbent = min(incumbent, (m, f))
+                status.put(("goal", m, f, g, (wid, i)))
+                continue
+            expanded += 1
+            for a, s2, cost in expand(s):
+                generated += 1
+                g2, h2 = g + cost, hfun(s2, s)
+                k2 = encode(s2)
+                item = (k2, g2, h2, max(m, g2 + h2), (wid, i), a)
+                j = _owner(k2, workers)
+                if j == wid:
+                    push(*item)
+                else:
+                    out[j].append(item)
+            flush(False)
+        flush(not busy())
+
+# ---------- Điều phối ----------
+def hda_star(problem, heuristic, goal_fn=None, workers=2, batch=8,
+             max_expanded=200000, time_limit=None, cancel=None):
+    """
+    Hash-Distributed A* (HDA*): state chia cho `workers` tiến trình theo hash của key StateCodec,
+    mỗi tiến trình chạy A* cục bộ và gửi node con (key, g, cha) cho chủ sở hữu theo lô `batch`.
+    (pathmax f, f) của goal tốt nhất (incumbent) được phát cho mọi worker để cắt node không nhỏ
+    hơn; goal giữ theo (pathmax f, f, g) nhỏ nhất, tức goal astar tuần tự pop đầu tiên (xem
+    _worker). Hoà cả ba thì lấy tham chiếu (worker, chỉ số) nhỏ hơn, không nhất thiết là goal
+    astar chọn. Kết thúc khi hai vòng probe liên tiếp thấy mọi worker rảnh và số lô gửi = số lô
+    nhận (không còn node trên đường truyền); sau đó lần theo bảng cha của các worker để lấy
+    chuỗi action.
+    Cần start method "fork" (Linux/macOS); không có thì chạy astar tuần tự. workers ≤ 1 cũng vậy.
+    max_expanded / time_limit / cancel được kiểm tra ở tiến trình điều phối sau mỗi vòng probe.
+    Kết quả cùng định dạng astar (+ "workers", "h_stats" = (hits, misses, incremental) memo MST
+    cộng từ các tiến trình con).
+    """
+    if workers <= 1 or "fork" not in mp.get_all_start_methods():
+        res = astar(problem, heuristic, goal_fn=goal_fn, max_expanded=max_expanded,
+                    time_limit=time_limit, cancel=cancel)
+        res["workers"] = 1
+        return res
+
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit if time_limit is not None else None
+    batch = max(1, int(batch))
+    ctx = mp.get_context("fork")
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    status = ctx.Queue()
+    procs = [ctx.Process(target=_worker, daemon=True,
+                         args=(i, workers, problem, heuristic, goal_fn, inboxes, status, batch))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    start = problem.initial_state()
+    key0 = StateCodec(getattr(problem, "problem", problem), ghost_phase=False).encode(start)
+    h_start = heuristic_fn(heuristic)(start)
+    inboxes[_owner(key0, workers)].put(("nodes", [(key0, 0.0, h_start, h_start, None, None)]))
+    seed_sent = 1
+
+    best_key = (INF, INF, INF, None)
+    wave, replies, prev = 0, {}, None
+    stop = None
+    expanded = generated = 0
+
+    def probe():
+        nonlocal wave
+        wave += 1
+        replies.clear()
+        for q in inboxes:
+            q.put(("probe", wave))
+
+    probe()
+    next_probe = 0.0
+    while True:
+        try:
+            msg = status.get(timeout=PROBE_INTERVAL)
+        except queue.Empty:
+            msg = None
+        if msg is not None and msg[0] == "goal":
+            if best_key[3] is None or msg[1:] < best_key:
+                best_key = msg[1:]
+                for q in inboxes:
+                    q.put(("inc", best_key[:2]))
+        elif msg is not None and msg[0] == "probe" and msg[1] == wave:
+            replies[msg[2]] = msg[3:]
+            if len(replies) == workers:
+                expanded = sum(r[3] for r in replies.values())
+                generated = sum(r[4] for r in replies.values()) + 1
+                sent = sum(r[0] for r in replies.values()) + seed_sent
+                recv = sum(r[1] for r in replies.values())
+                quiet = all(r[2] for r in replies.values()) and sent == recv
+                if quiet and prev == (sent, recv):
+                    break
+                prev = (sent, recv) if quiet else None
+                if expanded > max_expanded:
+                    stop = "limit"
+                    break
+                next_probe = time.perf_counter() + PROBE_INTERVAL
+        if len(replies) == workers and time.perf_counter() >= next_probe:
+            probe()
+
+        if cancel is not None and cancel.is_set():
+            stop = "cancelled"
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            stop = "timeout"
+            break
+
+    # ---- lần theo bảng cha: mỗi worker trả đoạn đường nằm trong nó ----
+    actions = None
+    ref = best_key[3]
+    if ref is not None and stop != "cancelled":
+        rev = []
+        while ref is not None:
+            inboxes[ref[0]].put(("trace", ref[1]))
+            while True:
+                try:
+                    msg = status.get(timeout=1.0)
+                except queue.Empty:
+                    msg = None
+                    break
+                if msg[0] == "trace":
+                    break
+            if msg is None:
+                rev = None      # worker không trả lời: bỏ lời giải
+                break
+            rev.extend(msg[1])
+            ref = msg[2]
+        if rev is not None:
+            actions = rev[::-1]
+
+    # ---- dừng worker, gom thống kê cuối ----
+    for q in inboxes:
+        q.put(("stop",))
+    finals = {}
+    while len(finals) < workers:
+        try:
+            msg = status.get(timeout=1.0)
+        except queue.Empty:
+            break
+        if msg[0] == "final":
+            finals[msg[1]] = msg[2:]
+    for p in procs:
+        p.join(timeout=1.0)
+        if p.is_alive():
+            p.terminate()
+    if len(finals) == workers:
+        expanded = sum(e for e, _, _ in finals.values())
+        generated = sum(g for _, g, _ in finals.values()) + 1
+    h_stats = tuple(sum(x) for x in zip((0, 0, 0), *(hs for _, _, hs in finals.values())))
+
+    if actions is None:
+        if stop is not None:
+            res = _stopped(stop, generated, expanded, 0, t0)
+        else:
+            res = {"solution": None, "actions": [], "cost": INF,
+                   "generated": generated, "expanded": expanded}
+        res.update(workers=workers, h_stats=h_stats)
+        return res
+
+    # phát lại chuỗi hành động để có dãy state đầy đủ
+    s = start
+    states = [s]
+    for a in actions:
+        s = problem.result(s, a)
+        states.append(s)
+    res = {"solution": states, "actions": actions, "cost": best_key[2],
+           "generated": generated, "expanded": expanded, "workers": workers, "h_stats": h_stats}
+    if stop is not None:
+        res["reason"] = stop
+    return res
@@ -1,4 +1,7 @@
-from collections import deque
+from collections import deque, OrderedDict
+from kernels_np import np, bfs_rows_np, prim_mst_np, resolve_backend
+
+INF = 10**9
 
 # --- Heuristic động: BFS + teleport + eat wall ---
 def _neighbors_dyn_with_teleport(grid, p, anchors):
@@ -29,37 +32,256 @@ def _bfs_dyn_with_teleport(grid, src, dst, anchors) -> int:
                 dq.append(v)
     return 10**9  # unreachable
 
-def _prim_mst_cost(nodes, dfunc) -> int:
+def _bfs_row_with_teleport(grid, src, anchors) -> list:
+    """BFS một nguồn tới MỌI ô; kết quả là list theo chỉ số r*C+c (INF nếu không tới được)."""
+    R, C = len(grid), len(grid[0])
+    dist = [INF] * (R * C)
+    dist[src[0] * C + src[1]] = 0
+    dq = deque([src])
+    while dq:
+        u = dq.popleft()
+        du = dist[u[0] * C + u[1]] + 1
+        for v in _neighbors_dyn_with_teleport(grid, u, anchors):
+            i = v[0] * C + v[1]
+            if dist[i] == INF:
+                dist[i] = du
+                dq.append(v)
+    return dist
+
+# ---------- Bảng khoảng cách ô khoá -> mọi ô sàn ----------
+class KeyDistanceTable:
+    """
+    Khoảng cách (có teleport) từ các ô khoá tới mọi ô của MỘT phiên bản lưới.
+    Mỗi hàng là một BFS đầy đủ; đồ thị vô hướng nên d(u, v) = row(v)[u].
+    """
+    def __init__(self, grid, anchors):
+        self.grid = grid
+        self.anchors = anchors
+        self.C = len(grid[0])
+        self._rows = {}
+        self._np_rows = {}  # chỉ dùng với backend numpy
+
+    def row(self, src) -> list:
+        r = self._rows.get(src)
+        if r is None:
+            r = _bfs_row_with_teleport(self.grid, src, self.anchors)
+            self._rows[src] = r
+        return r
+
+    def prefill(self, sources, backend: str = "python"):
+        if backend == "numpy":
+            todo = [p for p in dict.fromkeys(sources) if p not in self._rows]
+            if todo:
+                batch = bfs_rows_np(self.grid, todo, self.anchors.values())
+                for p, arr in zip(todo, batch):
+                    self._np_rows[p] = arr
+                    self._rows[p] = arr.tolist()
+            return self
+        for p in sources:
+            self.row(p)
+        return self
+
+    def matrix(self, nodes):
+        """Ma trận dày D[i, j] = d(nodes[i], nodes[j]) cho Prim numpy."""
+        rows = []
+        for p in nodes:
+            arr = self._np_rows.get(p)
+            if arr is None:
+                arr = np.asarray(self.row(p), dtype=np.int64)
+                self._np_rows[p] = arr
+            rows.append(arr)
+        idx = [r * self.C + c for r, c in nodes]
+        return np.stack(rows)[:, idx]
+
+    def d(self, u, v) -> int:
+        r = self._rows.get(v)
+        if r is not None:
+            return r[u[0] * self.C + u[1]]
+        return self.row(u)[v[0] * self.C + v[1]]
+
+# ---------- LRU có giới hạn + đếm hit/miss ----------
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        v = self._data.get(key, default)
+        if v is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return v
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def peek(self, key, default=None):
+        # đọc không đổi thứ tự LRU, không tính hit/miss
+        return self._data.get(key, default)
+
+    def __len__(self):
+        return len(self._data)
+
+# dùng chung giữa các lần tìm kiếm: khoá theo nội dung lưới (đã phá tường)
+_table_cache = LRUCache(256)
+# chỉ mục (rot_idx, destroyed) -> bảng của mỗi heuristic (bảng thật nằm trong _table_cache)
+TABLE_INDEX_SIZE = 4096
+# cây MST của state cha cho sửa tăng dần; tách khỏi mst_cache để --mst-cache 0 vẫn dùng được
+PARENT_MST_SIZE = 4096
+
+def shared_distance_table(grid, anchors) -> KeyDistanceTable:
+    key = tuple(grid)
+    t = _table_cache.get(key)
+    if t is None:
+        t = KeyDistanceTable(key, anchors)
+        _table_cache.put(key, t)
+    return t
+
+def _prim_mst(nodes, dfunc):
+    """Prim dày O(n²); trả (tổng, danh sách cạnh (u, v, w)) để có thể sửa cây về sau."""
     n = len(nodes)
     if n <= 1:
-        return 0
+        return 0, []
     used = [False]*n
     best = [10**9]*n
+    par = [-1]*n
     best[0] = 0
     total = 0
+    edges = []
     for _ in range(n):
         u = -1; bu = 10**9
         for i in range(n):
             if not used[i] and best[i] < bu:
                 bu = best[i]; u = i
+        if u == -1:  # phần còn lại không tới được
+            u = used.index(False)
         used[u] = True
         total += best[u]
+        if par[u] >= 0:
+            edges.append((nodes[par[u]], nodes[u], best[u]))
         for v in range(n):
             if not used[v]:
                 w = dfunc(nodes[u], nodes[v])
                 if w < best[v]:
                     best[v] = w
-    return total
+                    par[v] = u
+    return total, edges
+
+def _prim_mst_cost(nodes, dfunc) -> int:
+    return _prim_mst(nodes, dfunc)[0]
+
+def _mst_remove_vertex(mst, removed, nodes, dfunc):
+    """
+    MST của `nodes` (= đỉnh của cây cũ trừ `removed`) suy từ cây cũ.
+    Các cạnh không chạm `removed` vẫn thuộc một MST mới (tính chất lát cắt), nên chỉ
+    cần nối lại deg(removed) mảnh rời bằng Kruskal trên cạnh giữa các mảnh.
+    """
+    total, edges = mst
+    keep, cut_w = [], 0
+    for e in edges:
+        if e[0] == removed or e[1] == removed:
+            cut_w += e[2]
+        else:
+            keep.append(e)
+    total -= cut_w
+    if len(edges) - len(keep) <= 1:  # lá: bỏ đúng một cạnh
+        return total, keep
+
+    comp = {p: p for p in nodes}
+    def find(x):
+        while comp[x] != x:
+            comp[x] = comp[comp[x]]
+            x = comp[x]
+        return x
+    for a, b, _ in keep:
+        comp[find(a)] = find(b)
+
+    n = len(nodes)
+    cand = []
+    for i in range(n):
+        ri = find(nodes[i])
+        for j in range(i + 1, n):
+            if ri != find(nodes[j]):
+                cand.append((dfunc(nodes[i], nodes[j]), i, j))
+    cand.sort()
+    need = len({find(p) for p in nodes}) - 1
+    for w, i, j in cand:
+        if need == 0:
+            break
+        a, b = find(nodes[i]), find(nodes[j])
+        if a != b:
+            comp[a] = b
+            total += w
+            keep.append((nodes[i], nodes[j], w))
+            need -= 1
+    return total, keep
 
 class HeuristicPacmanMST:
+    # astar truyền state cha vào h(s, parent) khi cờ này bật
+    uses_parent_hint = True
 
-    def __init__(self, problem=None, **kwargs):
+    def __init__(self, problem=None, mst_cache_size: int = 100_000, backend: str = "python", **kwargs):
         self.problem = problem
+        self.backend = resolve_backend(backend)
+        self._tables = LRUCache(TABLE_INDEX_SIZE)  # (rot_idx, destroyed) -> KeyDistanceTable
+        # MST chỉ phụ thuộc tập food còn lại + exit + phiên bản lưới
+        self.mst_cache = LRUCache(mst_cache_size)
+        self._mst_edges = LRUCache(PARENT_MST_SIZE)  # cùng khoá, chỉ phục vụ _mst_from_parent
+        self.mst_incremental = 0  # số MST suy từ cây của state cha
 
-    def _d(self, grid, anchors, u, v) -> int:
-        return _bfs_dyn_with_teleport(grid, u, v, anchors)
+    def _table(self, s) -> KeyDistanceTable:
+        key = (s.rot_idx, s.destroyed)
+        t = self._tables.get(key)
+        if t is None:
+            g = self.problem._grid_with_destruction(s)
+            anchors = self.problem._corner_anchor_positions(s)
+            t = shared_distance_table(g, anchors)
+            # ô khoá: foods, exit, anchors, pies của state đầu tiên gặp phiên bản lưới này
+            t.prefill(list(s.foods) + [self.problem._exit_at(s.rot_idx)]
+                      + list(anchors.values()) + list(s.pies), backend=self.backend)
+            self._tables.put(key, t)
+        return t
+
+    def _food_mask(self, foods, C) -> int:
+        mask = 0
+        for r, c in foods:
+            mask |= 1 << (r * C + c)
+        return mask
+
+    def _mst_from_parent(self, parent, s, tbl, nodes):
+        # chỉ dùng được khi cùng phiên bản lưới và cha có đúng thêm 1 food
+        if parent.rot_idx != s.rot_idx or parent.destroyed != s.destroyed:
+            return None
+        if len(parent.foods) != len(s.foods) + 1:
+            return None
+        pmst = self._mst_edges.peek((self._food_mask(parent.foods, tbl.C), s.rot_idx, s.destroyed))
+        if pmst is None or pmst[0] >= 10**8:
+            return None
+        eaten = set(parent.foods).difference(s.foods)
+        if len(eaten) != 1:
+            return None
+        self.mst_incremental += 1
+        return _mst_remove_vertex(pmst, eaten.pop(), nodes, tbl.d)
+
+    def nearest_food(self, s) -> int:
+        """Khoảng cách (teleport) tới food gần nhất, hết food thì tới exit; dùng làm tiêu chí phụ."""
+        if self.problem is None:
+            return 0
+        tbl = self._table(s)
+        pac_i = s.pacman[0] * tbl.C + s.pacman[1]
+        targets = s.foods or (self.problem._exit_at(s.rot_idx),)
+        return min(tbl.row(x)[pac_i] for x in targets)
 
-    def h(self, s) -> int:
+    def h(self, s, parent=None) -> int:
         if self.problem is None:
             return 0 
 
@@ -67,24 +289,35 @@ class HeuristicPacmanMST:
         foods = list(s.foods)
         exit_pos = self.problem._exit_at(s.rot_idx)
 
-        # Lưới động
-        g = self.problem._grid_with_destruction(s)
-        anchors = self.problem._corner_anchor_positions(s)
+        # Bảng khoảng cách của lưới động hiện tại
+        tbl = self._table(s)
+        pac_i = pac[0] * tbl.C + pac[1]
 
         # Nếu không còn food: chỉ còn đường tới exit
         if not foods:
-            d_exit = self._d(g, anchors, pac, exit_pos)
+            d_exit = tbl.row(exit_pos)[pac_i]
             return 0 if d_exit >= 10**8 else d_exit
 
         # S = foods ∪ {exit}
         nodes = foods + [exit_pos]
 
         # min distance từ pac tới S (teleport-aware)
-        mind = min(self._d(g, anchors, pac, x) for x in nodes)
+        mind = min(tbl.row(x)[pac_i] for x in nodes)
 
-        # MST
-        def dfunc(a, b): return self._d(g, anchors, a, b)
-        mst_cost = _prim_mst_cost(nodes, dfunc)
+        # MST (memo theo (food bitmask, rot_idx, destroyed)); trượt memo thì thử suy từ cây của cha
+        key = (self._food_mask(foods, tbl.C), s.rot_idx, s.destroyed)
+        mst = self.mst_cache.get(key)
+        if mst is None:
+            if parent is not None:
+                mst = self._mst_from_parent(parent, s, tbl, nodes)
+            if mst is None:
+                if self.backend == "numpy":
+                    mst = prim_mst_np(nodes, tbl.matrix(nodes))
+                else:
+                    mst = _prim_mst(nodes, tbl.d)
+            self.mst_cache.put(key, mst)
+        self._mst_edges.put(key, mst)
+        mst_cost = mst[0]
 
         ans = mind + mst_cost
         return 0 if ans >= 10**8 else ans
@@ -0,0 +1,103 @@
+import threading
+
+from heuristics import HeuristicPacmanMST
+from pacman_problem import PacmanProblem, PacmanState, Ghost
+
+class RootedProblem:
+    """PacmanProblem nhìn từ một state bất kỳ: initial_state() = start, mọi thứ khác (bảng quay,
+    ghost timeline, cache overlay/anchor/tick) dùng chung với problem gốc."""
+    def __init__(self, problem, start):
+        self._problem = problem
+        self._root = start
+
+    def initial_state(self):
+        return self._root
+
+    def __getattr__(self, name):
+        return getattr(self._problem, name)
+
+def _norm(s):
+    # so sánh state bỏ qua thứ tự foods/pies/destroyed (xoay thế giới giữ thứ tự, không giữ sorted)
+    return (s.pacman, frozenset(s.foods), frozenset(s.pies), s.ghosts, s.ttl, s.steps_mod30,
+            s.rot_idx % 4, frozenset(s.destroyed))
+
+class IncrementalPlanner:
+    """
+    Giữ một PacmanProblem + HeuristicPacmanMST qua các lần replan thay vì dựng lại mỗi lần.
+    Ảnh chụp thế giới của GUI (lưới đã xoay, tường đã bị ăn) được quy về state của problem đang giữ:
+    thử 4 góc quay, tường bị ăn = tường gốc - tường hiện tại. Nhờ vậy:
+      - Pacman còn nằm trên lời giải trước và đích chưa đổi -> trả phần còn lại, không search;
+      - ngược lại search từ state đó với các cache đã ấm (bảng khoảng cách, MST memo, timeline ma,
+        overlay/anchor theo tường bị phá);
+      - chỉ dựng lại problem khi ảnh chụp không khớp góc quay nào (layout khác).
+    Dùng `with planner.lock:` quanh prepare + search + commit khi gọi từ nhiều luồng.
+    """
+    def __init__(self, mst_cache_size=100_000, backend="python"):
+        self.mst_cache_size = mst_cache_size
+        self.backend = backend
+        self.problem = None
+        self.hz = None
+        self.path = []       # state của lời giải gần nhất (trong khung của problem)
+        self.actions = []
+        self.lock = threading.Lock()
+        self.stats = {"rebuilds": 0, "reused": 0, "searches": 0}
+
+    def _rebuild(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step):
+        self.problem = PacmanProblem(grid, pac, foods, exit_pos, pies=pies, ghosts=ghosts,
+                                     ttl0=ttl, steps_mod30_0=step, rot_idx0=0)
+        self.hz = HeuristicPacmanMST(self.problem, mst_cache_size=self.mst_cache_size, backend=self.backend)
+        self.path, self.actions = [], []
+        self.stats["rebuilds"] += 1
+        return self.problem.initial_state()
+
+    def locate(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step):
+        """State của problem đang giữ ứng với ảnh chụp, None nếu không khớp."""
+        P = self.problem
+        if P is None:
+            return None
+        R, C = len(grid), len(grid[0])
+        walls = frozenset((r, c) for r in range(R) for c in range(C) if grid[r][c] == '%')
+        gh = tuple(Ghost(tuple(p), d) for p, d in ghosts)
+        on_path = {_norm(s) for s in self.path}
+        found = None
+        # ưu tiên góc quay của lời giải trước (lưới đối xứng có thể khớp nhiều góc)
+        hint = self.path[-1].rot_idx % 4 if self.path else 0
+        for k in [hint] + [k for k in range(4) if k != hint]:
+            t = P._tables[k]
+            if (t.R, t.C) != (R, C) or t.exit_pos != tuple(exit_pos) or not walls <= t.walls:
+                continue
+            destroyed = tuple(sorted(t.walls - walls))
+            s = PacmanState(tuple(pac), tuple(sorted(foods)), tuple(sorted(pies)), gh,
+                            int(ttl), int(step) % 30, k, destroyed)
+            if _norm(s) in on_path:
+                return s
+            if found is None:
+                found = s
+        return found
+
+    def prepare(self, grid, pac, foods, pies, ghosts, exit_pos, ttl, step, goal_fn=None):
+        """
+        -> (problem, hz, suffix). suffix = (actions, states) còn dùng được của lời giải trước
+        (không cần search) hoặc None; problem là RootedProblem đặt gốc tại state hiện tại.
+        """
+        s = self.locate(grid, pac, foods, pies, ghosts, exit_pos, ttl, step)
+        if s is None:
+            s = self._rebuild(grid, pac, foods, pies, ghosts, exit_pos, ttl, step)
+        key = _norm(s)
+        for i, st in enumerate(self.path[:-1]):
+            if _norm(st) == key:
+                end = self.path[-1]
+                done = self.problem.is_goal(end) if goal_fn is None else bool(goal_fn(end))
+                if done:
+                    self.stats["reused"] += 1
+                    return self.problem, self.hz, (self.actions[i:], self.path[i:])
+                break
+        self.stats["searches"] += 1
+        return RootedProblem(self.problem, s), self.hz, None
+
+    def commit(self, res):
+        """Ghi nhớ lời giải vừa tìm để lần replan sau có thể dùng lại."""
+        if res and res.get("solution"):
+            self.path, self.actions = list(res["solution"]), list(res["actions"])
+        else:
+            self.path, self.actions = [], []
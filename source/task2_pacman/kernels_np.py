@@ -0,0 +1,82 @@
+"""
+Kernel NumPy tuỳ chọn cho BFS lưới và Prim.
+Không có numpy thì HAS_NUMPY = False và nơi gọi dùng bản Python thuần
+(heuristics._bfs_row_with_teleport / _prim_mst); kết quả hai bên trùng nhau.
+"""
+try:
+    import numpy as np
+except ImportError:  # numpy là phụ thuộc tuỳ chọn
+    np = None
+
+HAS_NUMPY = np is not None
+INF = 10**9
+
+def resolve_backend(name: str) -> str:
+    """'numpy' chỉ khi được yêu cầu VÀ import được; còn lại 'python'."""
+    return "numpy" if (name == "numpy" and HAS_NUMPY) else "python"
+
+def open_mask(grid):
+    return np.array([[ch != '%' for ch in row] for row in grid], dtype=bool)
+
+def bfs_rows_np(grid, sources, anchors=None):
+    """
+    BFS nhiều nguồn cùng lúc: frontier (k, R, C) lan 4 hướng trên mảng ô mở,
+    anchor trong frontier thì mọi anchor khác được thêm vào tầng kế.
+    Trả mảng (k, R*C) int64, INF nếu không tới được.
+    """
+    R, C = len(grid), len(grid[0])
+    k = len(sources)
+    open_ = open_mask(grid)
+    anchor_mask = np.zeros((R, C), dtype=bool)
+    for (r, c) in set(anchors or ()):
+        anchor_mask[r, c] = True
+    use_teleport = bool(anchor_mask.any())
+
+    dist = np.full((k, R, C), INF, dtype=np.int64)
+    frontier = np.zeros((k, R, C), dtype=bool)
+    if k:
+        frontier[np.arange(k), [p[0] for p in sources], [p[1] for p in sources]] = True
+    visited = frontier.copy()
+    dist[frontier] = 0
+
+    d = 0
+    while frontier.any():
+        nxt = np.zeros_like(frontier)
+        nxt[:, 1:, :]  |= frontier[:, :-1, :]
+        nxt[:, :-1, :] |= frontier[:, 1:, :]
+        nxt[:, :, 1:]  |= frontier[:, :, :-1]
+        nxt[:, :, :-1] |= frontier[:, :, 1:]
+        nxt &= open_
+        if use_teleport:
+            touched = (frontier & anchor_mask).any(axis=(1, 2))
+            nxt[touched] |= anchor_mask
+        nxt &= ~visited
+        d += 1
+        dist[nxt] = d
+        visited |= nxt
+        frontier = nxt
+    return dist.reshape(k, R * C)
+
+def prim_mst_np(nodes, D):
+    """Prim trên ma trận khoảng cách dày D (n, n); cập nhật best bằng vector. Trả (tổng, cạnh)."""
+    n = len(nodes)
+    if n <= 1:
+        return 0, []
+    used = np.zeros(n, dtype=bool)
+    best = np.full(n, INF, dtype=np.int64)
+    par = np.full(n, -1, dtype=np.int64)
+    best[0] = 0
+    total = 0
+    edges = []
+    for _ in range(n):
+        u = int(np.argmin(np.where(used, INF + 1, best)))
+        used[u] = True
+        w = int(best[u])
+        total += w
+        if par[u] >= 0:
+            edges.append((nodes[int(par[u])], nodes[u], w))
+        row = D[u]
+        upd = ~used & (row < best)
+        best[upd] = row[upd]
+        par[upd] = u
+    return total, edges
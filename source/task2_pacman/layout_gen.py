@@ -0,0 +1,187 @@
+from __future__ import annotations
+import os, sys, argparse, random
+from collections import deque
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from pacman_problem import PacmanProblem
+from experiments import parse_layout
+from tour import plan_tour
+
+# ==== TẦNG BENCHMARK ====
+# tên -> (rows, cols, loops, foods, pies, ghosts, số map); mỗi map lệch ngẫu nhiên quanh các giá trị này
+TIERS = {
+    "small":  (11, 21, 0.20, 4, 1, 1, 5),
+    "medium": (21, 41, 0.15, 8, 2, 3, 5),
+    "large":  (41, 81, 0.12, 12, 3, 6, 4),
+    "stress": (81, 161, 0.10, 20, 4, 10, 3),
+}
+CORPUS_DIR = os.path.join(BASE_DIR, "input", "bench")
+
+# ==== SINH MÊ CUNG ====
+def _carve(R, C, rng):
+    """Mê cung hoàn hảo (DFS quay lui) trên ô lẻ; viền luôn là tường."""
+    g = [['%'] * C for _ in range(R)]
+    start = (1, 1)
+    g[1][1] = ' '
+    stack = [start]
+    while stack:
+        r, c = stack[-1]
+        nxt = [(r + dr, c + dc) for dr, dc in ((2, 0), (-2, 0), (0, 2), (0, -2))
+               if 0 < r + dr < R - 1 and 0 < c + dc < C - 1 and g[r + dr][c + dc] == '%']
+        if not nxt:
+            stack.pop()
+            continue
+        nr, nc = rng.choice(nxt)
+        g[(r + nr) // 2][(c + nc) // 2] = ' '
+        g[nr][nc] = ' '
+        stack.append((nr, nc))
+    return g
+
+def _add_loops(g, loops, rng):
+    """Phá ngẫu nhiên tỉ lệ `loops` các tường ngăn giữa hai ô sàn -> hành lang có vòng."""
+    R, C = len(g), len(g[0])
+    cand = []
+    for r in range(1, R - 1):
+        for c in range(1, C - 1):
+            if g[r][c] != '%':
+                continue
+            if (g[r - 1][c] != '%' and g[r + 1][c] != '%') or (g[r][c - 1] != '%' and g[r][c + 1] != '%'):
+                cand.append((r, c))
+    for r, c in rng.sample(cand, int(len(cand) * loops)):
+        g[r][c] = ' '
+
+def _bfs(g, src):
+    R, C = len(g), len(g[0])
+    dist = {src: 0}
+    dq = deque([src])
+    while dq:
+        r, c = dq.popleft()
+        for v in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if 0 <= v[0] < R and 0 <= v[1] < C and v not in dist and g[v[0]][v[1]] != '%':
+                dist[v] = dist[(r, c)] + 1
+                dq.append(v)
+    return dist
+
+def generate_layout(rows, cols, seed, loops=0.15, foods=6, pies=1, ghosts=2):
+    """
+    Layout cùng định dạng parse_layout đọc ('%', ' ', 'P', 'E', '.', 'O', 'G'), tất định theo seed.
+    Exit đặt ở nửa xa Pacman nhất; ma đặt ở ô đi ngang được và cách Pacman ≥ 4 bước.
+    Không đủ ô cho số ma yêu cầu -> ValueError (generate_solvable sẽ thử seed khác).
+    """
+    rng = random.Random(seed)
+    g = _carve(rows, cols, rng)
+    _add_loops(g, loops, rng)
+    floor = [(r, c) for r in range(rows) for c in range(cols) if g[r][c] != '%']
+    pac = rng.choice(floor)
+    dist = _bfs(g, pac)
+    far = sorted(dist, key=dist.get)[len(dist) // 2:]
+    exit_pos = rng.choice(far)
+    free = [p for p in floor if p not in (pac, exit_pos)]
+    rng.shuffle(free)
+    food_cells, free = free[:foods], free[foods:]
+    pie_cells, free = free[:pies], free[pies:]
+    lanes = [p for p in free if dist.get(p, 0) >= 4
+             and (g[p[0]][p[1] - 1] != '%' or g[p[0]][p[1] + 1] != '%')]
+    if len(lanes) < ghosts:
+        raise ValueError(f"Chỉ có {len(lanes)} ô đặt ma, cần {ghosts} (seed={seed}).")
+    ghost_cells = lanes[:ghosts]
+    for ch, cells in (('.', food_cells), ('O', pie_cells), ('G', ghost_cells)):
+        for r, c in cells:
+            g[r][c] = ch
+    g[pac[0]][pac[1]] = 'P'
+    g[exit_pos[0]][exit_pos[1]] = 'E'
+    return ["".join(row) for row in g]
+
+# ==== KIỂM TRA GIẢI ĐƯỢC ====
+def _reachable(grid):
+    start, foods, exit_pos, _, _ = parse_layout(grid)
+    reach = _bfs(grid, start)
+    return exit_pos in reach and all(f in reach for f in foods)
+
+def check_solvable(grid, max_expanded=20000, time_limit=20.0):
+    """
+    Tĩnh: mọi food và exit tới được từ Pacman (bỏ qua ma; xoay lưới không đổi liên thông).
+    Động: plan_tour (có ma, xoay, pie) tìm được lời giải trong ngân sách.
+    -> (ok, cost hoặc lý do).
+    """
+    if not _reachable(grid):
+        return False, "unreachable"
+    start, foods, exit_pos, pies, ghosts = parse_layout(grid)
+    prob = PacmanProblem(grid, start, foods, exit_pos, pies=pies, ghosts=ghosts)
+    res = plan_tour(prob, max_expanded=max_expanded, time_limit=time_limit)
+    if not res.get("solution"):
+        return False, res.get("reason", "no-solution")
+    return True, res["cost"]
+
+def generate_solvable(rows, cols, seed, attempts=20, verify=True, **kw):
+    """Thử seed, seed+1000, ... tới khi được map giải được -> (grid, seed thực dùng)."""
+    for i in range(attempts):
+        s = seed + 1000 * i
+        try:
+            grid = generate_layout(rows, cols, s, **kw)
+        except ValueError:
+            continue
+        ok = check_solvable(grid)[0] if verify else _reachable(grid)
+        if ok:
+            return grid, s
+    raise RuntimeError(f"Không sinh được map giải được {rows}x{cols} (seed={seed}) sau {attempts} lần.")
+
+def write_layout(path, grid):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(grid) + "\n")
+
+def build_corpus(out_dir=CORPUS_DIR, tiers=None, seed=0, verify=True):
+    """Sinh bộ benchmark theo tầng: out_dir/<tier>/<tier>_NN.txt (tất định theo seed)."""
+    written = []
+    for name in (tiers or TIERS):
+        rows, cols, loops, foods, pies, ghosts, count = TIERS[name]
+        for i in range(count):
+            rng = random.Random(f"{seed}:{name}:{i}")
+            kw = dict(loops=max(0.0, loops + rng.uniform(-0.05, 0.05)),
+                      foods=max(1, foods + rng.randint(-foods // 4, foods // 4)),
+                      pies=max(0, pies + rng.randint(-1, 1)),
+                      ghosts=max(0, ghosts + rng.randint(-1, 1)))
+            r = rows + 2 * rng.randint(-2, 2)
+            c = cols + 2 * rng.randint(-2, 2)
+            grid, used = generate_solvable(r, c, rng.randrange(10**6), verify=verify, **kw)
+            path = os.path.join(out_dir, name, f"{name}_{i:02d}.txt")
+            write_layout(path, grid)
+            written.append(path)
+            print(f"{path}: {r}x{c} seed={used} foods={kw['foods']} pies={kw['pies']} "
+                  f"ghosts={kw['ghosts']} loops={kw['loops']:.2f}", flush=True)
+    return written
+
+def main():
+    ap = argparse.ArgumentParser(description="Sinh layout Pacman ngẫu nhiên (tất định theo seed).")
+    ap.add_argument("--corpus", nargs="?", const=CORPUS_DIR, default=None,
+                    help="Sinh lại bộ benchmark theo tầng vào thư mục này (mặc định input/bench).")
+    ap.add_argument("--tiers", nargs="*", choices=tuple(TIERS), default=None, help="Chỉ sinh các tầng này.")
+    ap.add_argument("--rows", type=int, default=21)
+    ap.add_argument("--cols", type=int, default=41)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--loops", type=float, default=0.15, help="Tỉ lệ tường ngăn bị phá (0 = mê cung hoàn hảo).")
+    ap.add_argument("--foods", type=int, default=6)
+    ap.add_argument("--pies", type=int, default=1)
+    ap.add_argument("--ghosts", type=int, default=2)
+    ap.add_argument("--no-verify", action="store_true",
+                    help="Chỉ kiểm tra liên thông, không chạy planner để xác nhận giải được.")
+    ap.add_argument("-o", "--out", default="", help="File ra (mặc định in ra màn hình).")
+    args = ap.parse_args()
+
+    if args.corpus is not None:
+        build_corpus(args.corpus, args.tiers, args.seed, verify=not args.no_verify)
+        return
+    grid, used = generate_solvable(args.rows, args.cols, args.seed, verify=not args.no_verify,
+                                   loops=args.loops, foods=args.foods, pies=args.pies, ghosts=args.ghosts)
+    if args.out:
+        write_layout(args.out, grid)
+        print(f"Wrote {args.out} (seed={used})")
+    else:
+        print("\n".join(grid))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from pacman_problem import _DRDC
+
+class MacroProblem:
+    """
+    Lớp trừu tượng trên PacmanProblem: nén hành lang rộng 1 ô thành macro-edge nhiều bước.
+    Từ một state, mỗi hành động nguyên thuỷ hợp lệ được đi tiếp theo hành lang cho tới khi gặp
+    điểm quyết định (ngã rẽ/ngõ cụt, food, pie, anchor, exit). Mỗi bước vẫn chạy qua
+    problem.result nên va chạm ma được kiểm tra lại dọc cạnh; bước kế tiếp không hợp lệ thì cạnh
+    dừng ở state an toàn cuối cùng (thành điểm quyết định mới, có thể quay đầu/chờ ở đó).
+    Cạnh cũng bị cắt tại mốc xoay 30 bước, và không nén khi ttl > 0 (đang ăn được tường).
+    Action của cạnh là tuple hành động nguyên thuỷ, cost = số bước; xem flatten_actions / expand.
+    """
+    def __init__(self, problem, max_len=None):
+        self.problem = problem
+        self.max_len = max_len     # giới hạn độ dài cạnh (None = không giới hạn)
+
+    def initial_state(self):
+        return self.problem.initial_state()
+
+    def is_goal(self, s):
+        return self.problem.is_goal(s)
+
+    def result(self, s, a):
+        # a là macro-action (tuple) hoặc một hành động nguyên thuỷ
+        for x in (a if isinstance(a, tuple) else (a,)):
+            if s is None:
+                return None
+            s = self.problem.result(s, x)
+        return s
+
+    def dominance_key(self, s):
+        return self.problem.dominance_key(s)
+
+    def dominates(self, a, b):
+        return self.problem.dominates(a, b)
+
+    def _is_decision(self, s, g, anchor_set):
+        r, c = s.pacman
+        if s.pacman in anchor_set or s.pacman == self.problem._exit_at(s.rot_idx):
+            return True
+        if s.ttl > 0:
+            return True
+        R, C = len(g), len(g[0])
+        deg = 0
+        for dr, dc in _DRDC.values():
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < R and 0 <= nc < C and g[nr][nc] != '%':
+                deg += 1
+        return deg != 2
+
+    def _follow(self, s, prev):
+        """Từ s (vừa đi từ ô prev) đi tiếp theo hành lang -> (các action thêm, state cuối)."""
+        P = self.problem
+        acts = []
+        while self.max_len is None or len(acts) + 1 < self.max_len:
+            g, R, C, anchors, anchor_set = P._context(s)
+            if self._is_decision(s, g, anchor_set):
+                break
+            r, c = s.pacman
+            nxt = None
+            for a, (dr, dc) in _DRDC.items():
+                nr, nc = r + dr, c + dc
+                if (nr, nc) != prev and 0 <= nr < R and 0 <= nc < C and g[nr][nc] != '%':
+                    nxt = a
+                    break
+            s2 = P._result_ctx(s, nxt, (g, R, C, anchors, anchor_set)) if nxt is not None else None
+            if s2 is None:
+                break          # ma chặn phía trước: dừng ở state an toàn hiện tại
+            acts.append(nxt)
+            prev = s.pacman
+            s, s_prev = s2, s
+            if s.steps_mod30 == 0:
+                break          # vừa xoay lưới: cắt cạnh tại mốc 30 bước
+            if len(s.foods) != len(s_prev.foods) or len(s.pies) != len(s_prev.pies):
+                break          # vừa ăn food/pie: điểm quyết định
+        return acts, s
+
+    def successors(self, s):
+        out = []
+        for a, s1, _ in self.problem.successors(s):
+            if s1.steps_mod30 == 0 or s1.foods != s.foods or s1.pies != s.pies:
+                out.append(((a,), s1, 1.0))     # xoay / ăn food / ăn pie: dừng ngay
+                continue
+            more, s2 = self._follow(s1, s.pacman) if a in _DRDC else ([], s1)
+            out.append(((a,) + tuple(more), s2, float(1 + len(more))))
+        return out
+
+def flatten_actions(actions):
+    """Danh sách macro-action (tuple) -> danh sách N/S/E/W/teleport nguyên thuỷ."""
+    out = []
+    for a in actions:
+        if isinstance(a, tuple):
+            out.extend(a)
+        else:
+            out.append(a)
+    return out
+
+def expand(problem, res):
+    """Kết quả search trên MacroProblem -> cùng định dạng nhưng action/state theo từng bước."""
+    if not res or not res.get("solution"):
+        return res
+    actions = flatten_actions(res["actions"])
+    states = [res["solution"][0]]
+    for a in actions:
+        states.append(problem.result(states[-1], a))
+    out = dict(res)
+    out.update(solution=states, actions=actions)
+    return out
@@ -0,0 +1,96 @@
+import time
+
+from astar import successor_fn, heuristic_fn, _stopped, CHECK_EVERY
+
+INF = float("inf")
+
+def ida_star(problem, heuristic, goal_fn=None, tt_size=100_000, max_expanded=200000,
+             time_limit=None, cancel=None):
+    """
+    IDA* + bảng chuyển vị (transposition table) có giới hạn tt_size.
+    Bộ nhớ chỉ gồm đường đi hiện tại + TT, không giữ OPEN/best_g như astar, nên chạy được
+    layout lớn; đổi lại có thể expand lặp qua các vòng ngưỡng f.
+    TT lưu g nhỏ nhất đã thăm state trong vòng hiện tại: tới lại với g lớn hơn thì cắt.
+    Kết quả cùng định dạng astar (+ "iterations", "tt_peak"), kể cả khi dừng sớm.
+    Heuristic MST không chấp nhận được với goal_fn "ăn 1 food" (h(goal) > 0), nên IDA* và astar
+    có thể dừng ở goal khác nhau: trên map ví dụ, đoạn food cuối IDA* đi 16 bước (astar 18) nhưng
+    lệch pha xoay/ma, đoạn ra exit thành 34 thay vì 12 -> tổng cost 151 so với 131 của astar.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit if time_limit is not None else None
+    hfun = heuristic_fn(heuristic)
+    expand = successor_fn(problem)
+    is_goal = problem.is_goal if goal_fn is None else (lambda st: bool(goal_fn(st)))
+
+    start = problem.initial_state()
+    bound = hfun(start)
+    expanded = 0
+    generated = 1
+    iterations = 0
+    tt_peak = 0
+
+    def stopped(reason, tt, open_size):
+        res = _stopped(reason, generated, expanded, open_size, t0)
+        res.update(iterations=iterations, tt_peak=max(tt_peak, len(tt)))
+        return res
+
+    while True:
+        iterations += 1
+        tt = {start: 0.0}
+        on_path = {start}
+        # mỗi khung: [state, g, action, iterator con]; con được sinh lười
+        stack = [[start, 0.0, None, None]]
+        next_bound = INF
+
+        while stack:
+            if expanded > max_expanded:
+                return stopped("limit", tt, len(stack))
+            if expanded % CHECK_EVERY == 0:
+                if cancel is not None and cancel.is_set():
+                    return stopped("cancelled", tt, len(stack))
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return stopped("timeout", tt, len(stack))
+
+            frame = stack[-1]
+            s, g, _, it = frame
+            if it is None:
+                if is_goal(s):
+                    states = [f[0] for f in stack]
+                    actions = [f[2] for f in stack[1:]]
+                    return {"solution": states, "actions": actions, "cost": g,
+                            "generated": generated, "expanded": expanded,
+                            "iterations": iterations, "tt_peak": max(tt_peak, len(tt))}
+                expanded += 1
+                frame[3] = it = iter(expand(s))
+
+            child = None
+            for a, s2, cost in it:
+                g2 = g + cost
+                if s2 in on_path:
+                    continue
+                old = tt.get(s2)
+                if old is not None and old <= g2:
+                    continue
+                generated += 1
+                f2 = g2 + hfun(s2, s)
+                if f2 > bound:
+                    next_bound = min(next_bound, f2)
+                    continue
+                if old is not None or len(tt) < tt_size:
+                    tt[s2] = g2
+                child = (s2, g2, a)
+                break
+
+            if child is None:
+                stack.pop()
+                on_path.discard(s)
+                continue
+            on_path.add(child[0])
+            stack.append([child[0], child[1], child[2], None])
+
+        tt_peak = max(tt_peak, len(tt))
+        if next_bound == INF:
+            return {"solution": None, "actions": [], "cost": INF,
+                    "generated": generated, "expanded": expanded,
+                    "iterations": iterations, "tt_peak": tt_peak}
+        bound = next_bound
@@ -1,7 +1,10 @@
 from __future__ import annotations
 from typing import List, Tuple, Iterable, NamedTuple, Dict
 from functools import lru_cache
-from collections import deque
+from collections import deque, OrderedDict
+import threading
+
+from heuristics import LRUCache
 
 Pos = Tuple[int, int]
 Grid = List[str]
@@ -55,11 +58,221 @@ def _bfs_maze_dist(g: Grid, src: Pos, dst: Pos) -> int:
                 dq.append((nr, nc))
     return 10**9
 
+# ---------- Bảng thế giới theo từng góc quay ----------
+class RotationTable(NamedTuple):
+    grid: Tuple[str, ...]
+    R: int
+    C: int
+    exit_pos: Pos
+    walls: frozenset  # các ô '%' của lưới gốc ở góc quay này
+
+def build_rotation_tables(grid: Grid, exit_pos: Pos) -> Tuple[RotationTable, ...]:
+    """Dựng sẵn 4 lưới quay + exit + tập tường, dùng chung cho mọi state."""
+    R0, C0 = len(grid), len(grid[0])
+    tables = []
+    for k in range(4):
+        g = tuple(rotate_many(grid, k))
+        R, C = len(g), len(g[0])
+        walls = frozenset((r, c) for r in range(R) for c in range(C) if g[r][c] == '%')
+        tables.append(RotationTable(g, R, C, rot_pos_many(exit_pos, R0, C0, k), walls))
+    return tuple(tables)
+
+# ---------- Anchor 4 góc ----------
+ANCHOR_KEYS = ("TUL", "TUR", "TBL", "TBR")
+MOVE_ACTIONS = ("N", "S", "E", "W")
+_DRDC = {"N": (-1, 0), "S": (1, 0), "W": (0, -1), "E": (0, 1)}
+
+def _scan_rank(key: str, p: Pos) -> Tuple[int, int]:
+    # thứ tự quét tương ứng của từng góc: nhỏ hơn = gặp trước
+    r, c = p
+    if key == "TUL": return (r, c)
+    if key == "TUR": return (r, -c)
+    if key == "TBL": return (-r, c)
+    return (-r, -c)
+
+class AnchorIndex:
+    """
+    Anchor của một lưới (một góc quay), quét 4 góc đúng một lần.
+    Phá tường chỉ mở thêm ô nên anchor chỉ đổi khi ô bị phá nằm TRƯỚC anchor
+    hiện tại theo thứ tự quét -> cập nhật O(|destroyed|), không quét lại lưới.
+    """
+    def __init__(self, grid: Grid, walls: frozenset = None):
+        R, C = len(grid), len(grid[0])
+        if walls is None:
+            walls = frozenset((r, c) for r in range(R) for c in range(C) if grid[r][c] == '%')
+        self.walls = walls
+        fallback = {"TUL": (0, 0), "TUR": (0, C-1), "TBL": (R-1, 0), "TBR": (R-1, C-1)}
+        rows = {"TUL": range(R), "TUR": range(R), "TBL": range(R-1, -1, -1), "TBR": range(R-1, -1, -1)}
+        cols = {"TUL": range(C), "TUR": range(C-1, -1, -1), "TBL": range(C), "TBR": range(C-1, -1, -1)}
+        base = {}
+        for k in ANCHOR_KEYS:
+            base[k] = fallback[k]
+            for r in rows[k]:
+                c = next((c for c in cols[k] if grid[r][c] != '%'), None)
+                if c is not None:
+                    base[k] = (r, c)
+                    break
+        self.base: Dict[str, Pos] = base
+
+    def advance(self, anchors: Dict[str, Pos], opened: Pos) -> Dict[str, Pos]:
+        """Anchor sau khi phá thêm ô tường `opened`."""
+        if opened not in self.walls:
+            return anchors
+        out = anchors
+        for k in ANCHOR_KEYS:
+            if _scan_rank(k, opened) < _scan_rank(k, anchors[k]):
+                if out is anchors:
+                    out = dict(anchors)
+                out[k] = opened
+        return out
+
+    def anchors_for(self, destroyed: Iterable[Pos]) -> Dict[str, Pos]:
+        anchors = self.base
+        for p in destroyed:
+            anchors = self.advance(anchors, p)
+        return anchors
+
 # ---------- Ma ----------
 class Ghost(NamedTuple):
     pos: Pos
     dir: int 
 
+def _move_ghosts_on(g: Grid, ghosts: Tuple[Ghost, ...]) -> Tuple[Ghost, ...]:
+    R, C = len(g), len(g[0])
+    out = []
+    for gh in ghosts:
+        r, c = gh.pos
+        d = gh.dir
+        nc = c + d
+        if not (0 <= r < R and 0 <= nc < C) or g[r][nc] == '%':
+            d = -d
+            nc = c + d
+            if not (0 <= r < R and 0 <= nc < C) or g[r][nc] == '%':
+                out.append(Ghost((r, c), d))
+                continue
+        out.append(Ghost((r, nc), d))
+    return tuple(out)
+
+class GhostTick(NamedTuple):
+    moved: Tuple[Ghost, ...]   # ma sau tick (chưa xoay thế giới)
+    occ_before: frozenset      # ô có ma trước tick
+    occ_after: frozenset       # ô có ma sau tick
+    swaps: frozenset           # cạnh (ô cũ, ô mới) của ma -> Pacman đi ngược cạnh này là va chạm
+
+    @staticmethod
+    def of(old: Tuple[Ghost, ...], moved: Tuple[Ghost, ...]) -> "GhostTick":
+        return GhostTick(moved,
+                         frozenset(g.pos for g in old),
+                         frozenset(g.pos for g in moved),
+                         frozenset((a.pos, b.pos) for a, b in zip(old, moved)))
+
+# số frame mô phỏng thêm mỗi lần timeline cần dài ra
+TIMELINE_CHUNK = 256
+
+class GhostTimeline:
+    """
+    Quỹ đạo ma trên lưới gốc (chưa phá tường) kể từ (ghosts, rot_idx, steps_mod30) ban đầu.
+    Ma chỉ phụ thuộc thời gian nên mô phỏng đến khi cấu hình lặp lại:
+    frames[t] có chu kỳ `period` bắt đầu từ `mu`. ticks[t] là GhostTick của bước t,
+    probe[t] là các ô cạnh ma mà lần di chuyển đó đọc (phá tường ở đó -> ra khỏi timeline).
+    Dựng lười: chỉ mô phỏng thêm TIMELINE_CHUNK frame khi search chạm tới cuối phần đã có,
+    tới khi gặp chu kỳ hoặc max_len (complete=True; cắt ở max_len thì period = None).
+    """
+    def __init__(self, problem: "PacmanProblem", ghosts, rot_idx: int, steps_mod30: int,
+                 max_len: int = 100_000):
+        self._tables = problem._tables
+        self.max_len = max_len
+        self.frames: List[Tuple[Ghost, ...]] = []
+        self.ticks: List[GhostTick] = []
+        self.probe: List[frozenset] = []
+        self.index: Dict[tuple, int] = {}  # (ghosts, rot_idx, steps_mod30) -> t
+        self.mu = None
+        self.period = None
+        self.complete = False
+        self._next = (ghosts, rot_idx % 4, steps_mod30 % 30)   # cấu hình của frame kế tiếp
+        self._lock = threading.Lock()                        # timeline dùng chung giữa các luồng GUI
+        self.extend()
+
+    def extend(self, n: int = TIMELINE_CHUNK):
+        """Mô phỏng thêm tối đa n frame."""
+        with self._lock:
+            t = len(self.frames)
+            stop = min(t + n, self.max_len)
+            key = self._next
+            while not self.complete and t < stop:
+                if key in self.index:
+                    self.mu = self.index[key]
+                    self.period = t - self.mu
+                    self.complete = True
+                    break
+                ghosts, rot, steps = key
+                self.index[key] = t
+                tbl = self._tables[rot]
+                moved = _move_ghosts_on(tbl.grid, ghosts)
+                self.frames.append(ghosts)
+                self.ticks.append(GhostTick.of(ghosts, moved))
+                self.probe.append(frozenset((g.pos[0], g.pos[1] + d) for g in ghosts for d in (-1, 1)))
+                steps = (steps + 1) % 30
+                if steps == 0:
+                    moved = tuple(Ghost(rot_pos_cw(g.pos, tbl.R, tbl.C), g.dir) for g in moved)
+                    rot = (rot + 1) % 4
+                key = (moved, rot, steps)
+                t += 1
+            self._next = key
+            if not self.complete and t >= self.max_len:
+                if key in self.index:
+                    self.mu = self.index[key]
+                    self.period = t - self.mu
+                self.complete = True
+
+    def find(self, key) -> "int | None":
+        """Chỉ số t của cấu hình (ghosts, rot_idx, steps_mod30); None nếu không nằm trên timeline."""
+        t = self.index.get(key)
+        if t is None:
+            if self.complete or key != self._next:
+                return None
+            self.extend()
+            t = self.index.get(key)
+        if t is not None and t + 1 >= len(self.frames) and not self.complete:
+            self.extend()    # frame của bước kế tiếp cũng có chỉ số (StateCodec mã hoá ổn định)
+        return t
+
+    def norm(self, t: int) -> "int | None":
+        """Chỉ số frame ứng với t bước (quy về chu kỳ); None nếu vượt max_len mà không có chu kỳ."""
+        while t >= len(self.frames) and not self.complete:
+            self.extend(max(TIMELINE_CHUNK, t + 1 - len(self.frames)))
+        if t < len(self.frames):
+            return t
+        if self.period is None:
+            return None
+        return self.mu + (t - self.mu) % self.period
+
+    def at(self, t: int) -> Tuple[Ghost, ...]:
+        """Ma sau t bước kể từ đầu timeline (dùng chu kỳ cho t lớn)."""
+        i = self.norm(t)
+        if i is None:
+            raise IndexError("timeline bị cắt ở max_len, không có chu kỳ")
+        return self.frames[i]
+
+# timeline dùng chung giữa các problem cùng lưới + cấu hình ma (replan, các đoạn "ăn 1 food")
+TIMELINE_CACHE_MAX = 16
+_timeline_cache: "OrderedDict[tuple, GhostTimeline]" = OrderedDict()
+_timeline_lock = threading.Lock()
+
+def shared_ghost_timeline(problem: "PacmanProblem", ghosts, rot_idx: int, steps_mod30: int) -> GhostTimeline:
+    key = (problem._tables[0].grid, ghosts, rot_idx % 4, steps_mod30 % 30)
+    with _timeline_lock:
+        tl = _timeline_cache.get(key)
+        if tl is not None:
+            _timeline_cache.move_to_end(key)
+            return tl
+    tl = GhostTimeline(problem, ghosts, rot_idx, steps_mod30)
+    with _timeline_lock:
+        _timeline_cache[key] = tl
+        if len(_timeline_cache) > TIMELINE_CACHE_MAX:
+            _timeline_cache.popitem(last=False)
+    return tl
+
 class PacmanState(NamedTuple):
     pacman: Pos
     foods: Tuple[Pos, ...]
@@ -70,6 +283,10 @@ class PacmanState(NamedTuple):
     rot_idx: int
     destroyed: Tuple[Pos, ...]  # các ô tường đã bị ăn 
 
+# giới hạn cache theo problem: lưới/anchor theo (rot_idx, destroyed), tick ma ngoài timeline
+OVERLAY_CACHE_SIZE = 4096
+TICK_MEMO_SIZE = 100_000
+
 # ---------- Bài toán ----------
 class PacmanProblem:
     def __init__(self, grid: Grid, start: Pos, foods: List[Pos], exit_pos: Pos,
@@ -79,6 +296,17 @@ class PacmanProblem:
         self.orig_R, self.orig_C = len(grid), len(grid[0])
         self.exit_orig = exit_pos
         self.pies_orig = tuple(pies or [])
+        self._tables = build_rotation_tables(grid, exit_pos)
+        # lưới đã phá tường, cache theo (rot_idx, destroyed); có giới hạn vì số tập destroyed
+        # tăng theo tổ hợp khi có pie và problem của GUI sống qua nhiều lần replan
+        self._overlay_cache = LRUCache(OVERLAY_CACHE_SIZE)
+        # anchor 4 góc: tính một lần mỗi góc quay, cache theo (rot_idx, destroyed)
+        self._anchor_idx = tuple(AnchorIndex(t.grid, t.walls) for t in self._tables)
+        self._anchor_base = tuple((ix.base, frozenset(ix.base.values())) for ix in self._anchor_idx)
+        self._anchor_cache = LRUCache(OVERLAY_CACHE_SIZE)
+        # ma: timeline trên lưới gốc (dựng lười) + memo tick cho cấu hình ngoài timeline
+        self._timeline = None
+        self._tick_memo = LRUCache(TICK_MEMO_SIZE)
 
         # sanitize ghosts
         safe_ghosts = []
@@ -109,10 +337,10 @@ class PacmanProblem:
 
     # ---------- helpers ----------
     def _current_grid(self, rot_idx: int) -> Grid:
-        return rotate_many(self.orig_grid, rot_idx)
+        return self._tables[rot_idx % 4].grid
 
     def _exit_at(self, rot_idx: int) -> Pos:
-        return rot_pos_many(self.exit_orig, self.orig_R, self.orig_C, rot_idx)
+        return self._tables[rot_idx % 4].exit_pos
 
     def _apply_destruction(self, g: Grid, destroyed: Tuple[Pos, ...]) -> Grid:
         if not destroyed:
@@ -124,53 +352,38 @@ class PacmanProblem:
                 rows[r][c] = ' '
         return ["".join(row) for row in rows]
 
+    def _grid_at(self, rot_idx: int, destroyed: Tuple[Pos, ...]) -> Grid:
+        if not destroyed:
+            return self._tables[rot_idx % 4].grid
+        key = (rot_idx % 4, destroyed)
+        g = self._overlay_cache.get(key)
+        if g is None:
+            g = tuple(self._apply_destruction(self._tables[key[0]].grid, destroyed))
+            self._overlay_cache.put(key, g)
+        return g
+
     def _grid_with_destruction(self, s: PacmanState) -> Grid:
-        g = self._current_grid(s.rot_idx)
-        return self._apply_destruction(g, s.destroyed)
+        return self._grid_at(s.rot_idx, s.destroyed)
+
+    def _anchors_at(self, rot_idx: int, destroyed: Tuple[Pos, ...]):
+        if not destroyed:
+            return self._anchor_base[rot_idx % 4]
+        key = (rot_idx % 4, destroyed)
+        hit = self._anchor_cache.get(key)
+        if hit is None:
+            anchors = self._anchor_idx[key[0]].anchors_for(destroyed)
+            hit = (anchors, frozenset(anchors.values()))
+            self._anchor_cache.put(key, hit)
+        return hit
 
     def _corner_anchor_positions(self, arg) -> Dict[str, Pos]:
         if isinstance(arg, int):
-            rot_idx = arg
-            g = self._current_grid(rot_idx)
-        else:
-            s = arg
-            g = self._grid_with_destruction(s)
-        R, C = len(g), len(g[0])
+            return self._anchor_idx[arg % 4].base
+        return self._anchors_at(arg.rot_idx, arg.destroyed)[0]
 
-        def first_open_from_top_left():
-            for r in range(R):
-                for c in range(C):
-                    if g[r][c] != '%':
-                        return (r, c)
-            return (0, 0)
-
-        def first_open_from_top_right():
-            for r in range(R):
-                for c in range(C-1, -1, -1):
-                    if g[r][c] != '%':
-                        return (r, c)
-            return (0, C-1)
-
-        def first_open_from_bottom_left():
-            for r in range(R-1, -1, -1):
-                for c in range(C):
-                    if g[r][c] != '%':
-                        return (r, c)
-            return (R-1, 0)
-
-        def first_open_from_bottom_right():
-            for r in range(R-1, -1, -1):
-                for c in range(C-1, -1, -1):
-                    if g[r][c] != '%':
-                        return (r, c)
-            return (R-1, C-1)
-
-        return {
-            "TUL": first_open_from_top_left(),
-            "TUR": first_open_from_top_right(),
-            "TBL": first_open_from_bottom_left(),
-            "TBR": first_open_from_bottom_right(),
-        }
+    def is_anchor(self, s: PacmanState, pos: Pos = None) -> bool:
+        """O(1): pos (mặc định s.pacman) có phải anchor góc trong lưới của s không."""
+        return (s.pacman if pos is None else pos) in self._anchors_at(s.rot_idx, s.destroyed)[1]
 
     # cache 
     @lru_cache(maxsize=100_000)
@@ -186,33 +399,38 @@ class PacmanProblem:
         return len(s.foods) == 0 and s.pacman == self._exit_at(s.rot_idx)
 
     def actions(self, s: PacmanState) -> Iterable[str]:
-        move_actions = ["N", "S", "E", "W"]
-        anchors = self._corner_anchor_positions(s)
-        at_anchor = s.pacman in anchors.values()
-        if at_anchor:
-            return ["TUL", "TUR", "TBL", "TBR"] + move_actions
+        move_actions = list(MOVE_ACTIONS)
+        if self.is_anchor(s):
+            return list(ANCHOR_KEYS) + move_actions
         return move_actions
 
     def _move_ghosts_dyn(self, s: PacmanState) -> Tuple[Ghost, ...]:
-        g = self._grid_with_destruction(s)
-        R, C = len(g), len(g[0])
-        out = []
-        for gh in s.ghosts:
-            r, c = gh.pos
-            d = gh.dir
-            nc = c + d
-            if not (0 <= r < R and 0 <= nc < C) or g[r][nc] == '%':
-                d = -d
-                nc = c + d
-                if not (0 <= r < R and 0 <= nc < C) or g[r][nc] == '%':
-                    out.append(Ghost((r, c), d))
-                    continue
-            out.append(Ghost((r, nc), d))
-        return tuple(out)
+        return _move_ghosts_on(self._grid_with_destruction(s), s.ghosts)
+
+    @property
+    def ghost_timeline(self) -> "GhostTimeline":
+        if self._timeline is None:
+            s0 = self._start
+            self._timeline = shared_ghost_timeline(self, s0.ghosts, s0.rot_idx, s0.steps_mod30)
+        return self._timeline
+
+    def _ghost_tick(self, ghosts, rot_idx: int, steps_mod30: int, destroyed) -> "GhostTick":
+        # trên timeline và tường bị phá không nằm cạnh ma nào -> tra bảng
+        tl = self.ghost_timeline
+        t = tl.find((ghosts, rot_idx, steps_mod30))
+        if t is not None and not (destroyed and not tl.probe[t].isdisjoint(destroyed)):
+            return tl.ticks[t]
+        key = (ghosts, rot_idx, destroyed)
+        tick = self._tick_memo.get(key)
+        if tick is None:
+            tick = GhostTick.of(ghosts, _move_ghosts_on(self._grid_at(rot_idx, destroyed), ghosts))
+            self._tick_memo.put(key, tick)
+        return tick
 
     def _rotate_world(self, s: PacmanState) -> PacmanState:
         rnew = (s.rot_idx + 1) % 4
-        cur_R, cur_C = len(self._current_grid(s.rot_idx)), len(self._current_grid(s.rot_idx)[0])
+        t = self._tables[s.rot_idx % 4]
+        cur_R, cur_C = t.R, t.C
 
         pac = rot_pos_cw(s.pacman, cur_R, cur_C)
         foods = tuple(rot_pos_cw(p, cur_R, cur_C) for p in s.foods)
@@ -223,10 +441,28 @@ class PacmanProblem:
         return PacmanState(pac, foods, pies, ghosts, s.ttl, s.steps_mod30, rnew, destroyed)
 
     # ---------- transition ----------
-    def result(self, s: PacmanState, a: str) -> PacmanState | None:
+    def _context(self, s: PacmanState):
+        # phần dùng chung cho mọi action của cùng một state
         g = self._grid_with_destruction(s)
-        R, C = len(g), len(g[0])
-        anchors = self._corner_anchor_positions(s)
+        anchors, anchor_set = self._anchors_at(s.rot_idx, s.destroyed)
+        return g, len(g), len(g[0]), anchors, anchor_set
+
+    def result(self, s: PacmanState, a: str) -> PacmanState | None:
+        return self._result_ctx(s, a, self._context(s))
+
+    def successors(self, s: PacmanState) -> List[Tuple[str, PacmanState, float]]:
+        """Mọi (action, child, cost) hợp lệ; teleport trước rồi N/S/E/W (cùng thứ tự astar vẫn duyệt)."""
+        ctx = self._context(s)
+        acts = ANCHOR_KEYS + MOVE_ACTIONS if s.pacman in ctx[4] else MOVE_ACTIONS
+        out = []
+        for a in acts:
+            s2 = self._result_ctx(s, a, ctx)
+            if s2 is not None:
+                out.append((a, s2, 1.0))
+        return out
+
+    def _result_ctx(self, s: PacmanState, a: str, ctx) -> PacmanState | None:
+        g, R, C, anchors, anchor_set = ctx
 
         r, c = s.pacman
         nr, nc = r, c
@@ -234,9 +470,8 @@ class PacmanProblem:
         destroyed = set(s.destroyed)
 
         # 1) Di chuyển Pacman (ăn tường nếu ttl>0)
-        if a in ("N", "S", "E", "W"):
-            drdc = {"N": (-1, 0), "S": (1, 0), "W": (0, -1), "E": (0, 1)}
-            dr, dc = drdc[a]
+        if a in _DRDC:
+            dr, dc = _DRDC[a]
             tr, tc = r + dr, c + dc
             if not (0 <= tr < R and 0 <= tc < C):
                 return None
@@ -247,18 +482,27 @@ class PacmanProblem:
                     return None
             nr, nc = tr, tc
 
-        elif a in ("TUL", "TUR", "TBL", "TBR"):
-            if s.pacman not in anchors.values():
+        elif a in anchors:
+            if s.pacman not in anchor_set:
                 return None
             nr, nc = anchors[a]
         else:
             return None
 
+        if len(destroyed) != len(s.destroyed):
+            destroyed = tuple(destroyed)
+            # cập nhật anchor tăng dần từ state cha thay vì quét lại
+            key = (s.rot_idx % 4, destroyed)
+            if self._anchor_cache.peek(key) is None:
+                new_anchors = self._anchor_idx[key[0]].advance(anchors, (nr, nc))
+                self._anchor_cache.put(key, (new_anchors, frozenset(new_anchors.values())))
+        else:
+            destroyed = s.destroyed
+        tick = self._ghost_tick(s.ghosts, s.rot_idx, s.steps_mod30, destroyed)
+
         # 2) Va chạm 
-        if ttl == 0:
-            for gh in s.ghosts:
-                if gh.pos == (nr, nc):
-                    return None
+        if ttl == 0 and (nr, nc) in tick.occ_before:
+            return None
 
         # 3) Ăn food/pie
         foods = list(s.foods)
@@ -269,23 +513,103 @@ class PacmanProblem:
             pies.remove((nr, nc))
             ttl = 6
 
-        # 4) Ma di chuyển 
-        old_ghosts = s.ghosts
-        ghosts = self._move_ghosts_dyn(PacmanState((nr, nc), tuple(foods), tuple(pies), s.ghosts, ttl, s.steps_mod30, s.rot_idx, tuple(destroyed)))
+        # 4) Ma di chuyển (bảng timeline hoặc mô phỏng)
+        ghosts = tick.moved
 
         # 5) Va chạm SAU tick + GIAO CẮT CẠNH (swap)
-        for gh_old, gh_new in zip(old_ghosts, ghosts):
-            if gh_new.pos == (nr, nc):
-                return None
-            if gh_old.pos == (nr, nc) and gh_new.pos == (r, c):
-                return None
+        if (nr, nc) in tick.occ_after or ((nr, nc), (r, c)) in tick.swaps:
+            return None
 
         # 6) Tick xoay mỗi 30 bước
         steps_mod30 = (s.steps_mod30 + 1) % 30
-        new_state = PacmanState((nr, nc), tuple(foods), tuple(pies), ghosts, ttl, steps_mod30, s.rot_idx, tuple(destroyed))
+        new_state = PacmanState((nr, nc), tuple(foods), tuple(pies), ghosts, ttl, steps_mod30, s.rot_idx, destroyed)
         if steps_mod30 == 0:
             new_state = self._rotate_world(new_state)
         return new_state
 
     def step_cost(self, s: PacmanState, a: str, s2: PacmanState) -> float:
         return 1.0
+
+    # ---------- trội (closed list của astar với dominance=True) ----------
+    def dominance_key(self, s: PacmanState):
+        """-> (lõi phải trùng, tài nguyên ttl). Tập tường đã phá nằm trong lõi: nó đổi đường đi của ma
+        và anchor nên không so "nhiều hơn là tốt hơn" được."""
+        return ((s.pacman, s.foods, s.pies, s.ghosts, s.steps_mod30, s.rot_idx, frozenset(s.destroyed)),
+                s.ttl)
+
+    @staticmethod
+    def dominates(a, b) -> bool:
+        """
+        ttl a ≥ ttl b (cùng lõi). Đúng (không bỏ mất lời giải): mọi action hợp lệ ở b cũng hợp lệ
+        ở a và cho cùng state con trừ ttl vẫn ≥ — ăn tường cần ttl > 0, va chạm trước tick chỉ xét
+        khi ttl = 0, ăn pie đưa cả hai về 6, ma chỉ phụ thuộc tường đã phá (giống nhau); goal
+        không phụ thuộc ttl.
+        """
+        return a >= b
+
+# ---------- Mã hoá state gọn (bitmask) ----------
+def _mask_of(cells: Iterable[Pos], C: int) -> int:
+    m = 0
+    for r, c in cells:
+        m |= 1 << (r * C + c)
+    return m
+
+def _cells_of(mask: int, C: int) -> Tuple[Pos, ...]:
+    out = []
+    while mask:
+        low = mask & -mask
+        i = low.bit_length() - 1
+        out.append(divmod(i, C))
+        mask ^= low
+    return tuple(out)
+
+class StateCodec:
+    """
+    PacmanState <-> tuple 5 số nguyên:
+      (head, foods_mask, pies_mask, destroyed_mask, ghosts_packed)
+    head gói pacman/ttl/steps_mod30/rot_idx; các tập ô là bitmask theo chỉ số r*C+c
+    của lưới ở góc quay hiện tại; mỗi ma = (chỉ số ô << 1 | hướng) đặt liền nhau.
+    ghost_phase=True: ma nằm trên GhostTimeline thì chỉ lưu chỉ số t (bit cuối = 1).
+    """
+    def __init__(self, problem: PacmanProblem, ghost_phase: bool = True):
+        self._timeline = problem.ghost_timeline if ghost_phase else None
+        self._C = tuple(t.C for t in problem._tables)
+        self._cells = max(t.R * t.C for t in problem._tables)
+        self._gbits = self._cells.bit_length() + 1
+        self._gmask = (1 << self._gbits) - 1
+        self._n_ghosts = len(problem.ghosts_orig)
+
+    def encode(self, s: PacmanState) -> Tuple[int, int, int, int, int]:
+        C = self._C[s.rot_idx]
+        r, c = s.pacman
+        head = (((s.ttl * self._cells + r * C + c) * 30 + s.steps_mod30) << 2) | s.rot_idx
+        t = None if self._timeline is None else self._timeline.find((s.ghosts, s.rot_idx, s.steps_mod30))
+        if t is not None:
+            ghosts = (t << 1) | 1
+        else:
+            ghosts = 0
+            for i, gh in enumerate(s.ghosts):
+                gr, gc = gh.pos
+                ghosts |= (((gr * C + gc) << 1) | (gh.dir > 0)) << (i * self._gbits)
+            ghosts <<= 1
+        return (head, _mask_of(s.foods, C), _mask_of(s.pies, C),
+                _mask_of(s.destroyed, C), ghosts)
+
+    def decode(self, key: Tuple[int, int, int, int, int]) -> PacmanState:
+        head, foods, pies, destroyed, packed = key
+        rot_idx = head & 3
+        rest, steps = divmod(head >> 2, 30)
+        ttl, pac_idx = divmod(rest, self._cells)
+        C = self._C[rot_idx]
+        if packed & 1:
+            ghosts = self._timeline.frames[packed >> 1]
+        else:
+            packed >>= 1
+            ghosts = []
+            for _ in range(self._n_ghosts):
+                v = packed & self._gmask
+                packed >>= self._gbits
+                ghosts.append(Ghost(divmod(v >> 1, C), +1 if v & 1 else -1))
+            ghosts = tuple(ghosts)
+        return PacmanState(divmod(pac_idx, C), _cells_of(foods, C), _cells_of(pies, C),
+                           ghosts, ttl, steps, rot_idx, _cells_of(destroyed, C))
@@ -0,0 +1,217 @@
+from __future__ import annotations
+import os, sys, argparse, time, json, csv, statistics
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from experiments import (load_layout_file, parse_layout, resolve_layouts, run_for_food, run_tour,
+                         layout_hash, OUTPUT_DIR)
+
+try:
+    import resource     # chỉ có trên Unix
+except ImportError:
+    resource = None
+
+# cột của mỗi dòng kết quả (JSONL và CSV cùng thứ tự)
+FIELDS = ("layout", "tier", "layout_hash", "config", "rows", "cols", "foods", "pies", "ghosts",
+          "status", "cost", "expanded", "generated", "time_ms", "wall_ms", "peak_mb")
+
+# ==== CẤU HÌNH ====
+def _value(v: str):
+    low = v.lower()
+    if low in ("true", "yes", "on"):
+        return True
+    if low in ("false", "no", "off"):
+        return False
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+def parse_config(text: str) -> dict:
+    """"search=ida,tt_size=50000" -> {"search": "ida", "tt_size": 50000}; "" / "default" -> {}."""
+    out = {}
+    for part in text.split(","):
+        part = part.strip()
+        if not part or part == "default":
+            continue
+        k, _, v = part.partition("=")
+        out[k.strip().replace("-", "_")] = _value(v.strip()) if v else True
+    return out
+
+# ==== MỘT LẦN CHẠY (trong tiến trình con) ====
+def _peak_mb():
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024.0 if sys.platform != "darwin" else kb / (1024.0 * 1024.0)
+
+def run_task(path: str, config: str, max_expanded: int) -> dict:
+    """layout × cấu hình -> một dòng kết quả (chưa có wall_ms/peak_mb nếu chạy ngoài tiến trình con)."""
+    grid = load_layout_file(path)
+    start, foods, exit_pos, pies, ghosts = parse_layout(grid)
+    row = {"layout": os.path.basename(path), "tier": os.path.basename(os.path.dirname(path)),
+           "layout_hash": layout_hash(path), "config": config or "default",
+           "rows": len(grid), "cols": len(grid[0]),
+           "foods": len(foods), "pies": len(pies), "ghosts": len(ghosts)}
+    kw = parse_config(config)
+    kw.setdefault("max_expanded", max_expanded)
+    if kw.pop("tour", False):
+        m, _ = run_tour(grid, start, foods, exit_pos, pies, ghosts, kw["max_expanded"], kw.get("time_limit"))
+    else:
+        m = run_for_food(grid, start, foods, exit_pos, pies, ghosts, **kw)
+    row.update(status="ok" if m.solved else "fail", cost=m.cost if m.solved else None,
+               expanded=m.expanded, generated=m.generated, time_ms=round(m.time_ms, 1))
+    return row
+
+def _child(path, config, max_expanded, conn):
+    t0 = time.perf_counter()
+    try:
+        row = run_task(path, config, max_expanded)
+    except Exception as e:
+        row = {"layout": os.path.basename(path), "config": config or "default",
+               "status": f"error: {type(e).__name__}: {e}"}
+    row["wall_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    row["peak_mb"] = _peak_mb()
+    conn.send(row)
+    conn.close()
+
+# ==== POOL CÓ TIMEOUT TỪNG TASK ====
+def run_pool(tasks, jobs, timeout, max_expanded, on_row):
+    """
+    tasks: [(path, config)]. Mỗi task một tiến trình con (fork nếu có), tối đa `jobs` chạy cùng lúc;
+    task quá `timeout` giây bị terminate và ghi status="timeout". on_row(row) gọi ngay khi có kết quả.
+    Mỗi task trả kết quả qua Pipe riêng: terminate một tiến trình đang ghi chỉ hỏng ống của nó
+    (Queue dùng chung thì hỏng cả pool), và dòng tới muộn của task đã bị huỷ không lẫn sang task khác.
+    """
+    methods = mp.get_all_start_methods()
+    ctx = mp.get_context("fork" if "fork" in methods else methods[0])
+    pending = list(enumerate(tasks))
+    running = {}     # task_id -> (process, đầu đọc, t_start, path, config)
+    rows = []
+
+    def finish(row):
+        rows.append(row)
+        on_row(row)
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            tid, (path, config) = pending.pop(0)
+            r_conn, w_conn = ctx.Pipe(duplex=False)
+            p = ctx.Process(target=_child, args=(path, config, max_expanded, w_conn), daemon=True)
+            p.start()
+            w_conn.close()      # tiến trình cha chỉ đọc; con chết thì đầu đọc nhận EOF
+            running[tid] = (p, r_conn, time.perf_counter(), path, config)
+        by_conn = {v[1]: tid for tid, v in running.items()}
+        for conn in wait(list(by_conn), timeout=0.05):
+            p, _, _, path, config = running.pop(by_conn[conn])
+            try:
+                row = conn.recv()
+            except (EOFError, OSError):
+                row = None      # EOF: con chết (vd. hết bộ nhớ) trước khi gửi kết quả
+            conn.close()
+            p.join(timeout=1.0)
+            if row is None:
+                row = {"layout": os.path.basename(path), "config": config or "default",
+                       "status": f"crashed (exit {p.exitcode})"}
+            finish(row)
+        now = time.perf_counter()
+        for tid, (p, conn, t0, path, config) in list(running.items()):
+            if timeout is not None and now - t0 > timeout:
+                p.terminate()
+                p.join(timeout=1.0)
+                conn.close()    # bỏ luôn dòng có thể đã ghi dở/tới muộn
+                del running[tid]
+                grid = load_layout_file(path)
+                start, foods, _, pies, ghosts = parse_layout(grid)
+                finish({"layout": os.path.basename(path), "tier": os.path.basename(os.path.dirname(path)),
+                        "layout_hash": layout_hash(path), "config": config or "default",
+                        "rows": len(grid), "cols": len(grid[0]), "foods": len(foods), "pies": len(pies),
+                        "ghosts": len(ghosts), "status": "timeout", "wall_ms": round((now - t0) * 1000.0, 1)})
+    return rows
+
+# ==== GHI KẾT QUẢ ====
+class RowWriter:
+    """Ghi từng dòng ngay khi có (JSONL hoặc CSV theo đuôi file) để chạy dở vẫn còn dữ liệu."""
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if path.endswith(".csv"):
+            self._csv = csv.DictWriter(self._f, fieldnames=FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, row: dict):
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps({k: row.get(k) for k in FIELDS}, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+def _median(xs):
+    return statistics.median(xs) if xs else float("nan")
+
+def print_aggregate(rows):
+    """Bảng gộp theo (tầng, cấu hình): số lần chạy, giải được, timeout, cost/expanded/wall trung vị."""
+    groups = {}
+    for r in rows:
+        groups.setdefault((r.get("tier", "?"), r.get("config", "?")), []).append(r)
+    print(f"\n{'tier':<10} {'config':<28} {'runs':>4} {'ok':>3} {'t/o':>3} "
+          f"{'cost~':>8} {'exp~':>9} {'exp_sum':>10} {'wall~ms':>9} {'peak~MB':>8}")
+    for (tier, config), rs in sorted(groups.items()):
+        ok = [r for r in rs if r.get("status") == "ok"]
+        print(f"{tier:<10} {config[:28]:<28} {len(rs):>4} {len(ok):>3} "
+              f"{sum(r.get('status') == 'timeout' for r in rs):>3} "
+              f"{_median([r['cost'] for r in ok]):>8.1f} "
+              f"{_median([r['expanded'] for r in ok]):>9.0f} "
+              f"{sum(r.get('expanded') or 0 for r in rs):>10} "
+              f"{_median([r['wall_ms'] for r in rs if r.get('wall_ms') is not None]):>9.1f} "
+              f"{_median([r['peak_mb'] for r in rs if r.get('peak_mb') is not None]):>8.1f}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Chạy song song layout × cấu hình, ghi một dòng mỗi lần chạy.")
+    ap.add_argument("--layout", nargs="+", default=[""],
+                    help="File | folder | glob (.txt); có thể nhiều, vd. input/bench/small input/bench/medium.")
+    ap.add_argument("--config", action="append", default=None,
+                    help='Tham số run_for_food dạng "k=v,k=v" (vd. "macro=1", "search=ida,tt_size=50000"), '
+                         '"tour=1" cho plan_tour; lặp lại để so nhiều cấu hình. Mặc định: "default".')
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Số tiến trình chạy cùng lúc.")
+    ap.add_argument("--timeout", type=float, default=300.0, help="Giới hạn (giây) cho mỗi lần chạy; quá thì huỷ.")
+    ap.add_argument("--max-expanded", type=int, default=200000)
+    ap.add_argument("--out", default=os.path.join(OUTPUT_DIR, "runs.jsonl"), help="File kết quả (.jsonl hoặc .csv).")
+    args = ap.parse_args()
+
+    layouts = [p for arg in args.layout for p in resolve_layouts(arg)]
+    configs = args.config or ["default"]
+    tasks = [(p, c) for p in layouts for c in configs]
+    print(f"{len(layouts)} layout × {len(configs)} config = {len(tasks)} run | jobs={args.jobs} | "
+          f"timeout={args.timeout}s -> {args.out}", flush=True)
+
+    writer = RowWriter(args.out)
+    t0 = time.perf_counter()
+
+    def on_row(row):
+        writer.write(row)
+        cost = row.get("cost")
+        print(f"[{row.get('status')}] {row.get('tier', '')}/{row['layout']} | {row['config']} | "
+              f"cost={cost if cost is not None else '-'} | exp={row.get('expanded', '-')} | "
+              f"wall={row.get('wall_ms', '-')}ms", flush=True)
+
+    try:
+        rows = run_pool(tasks, max(1, args.jobs), args.timeout, args.max_expanded, on_row)
+    finally:
+        writer.close()
+    print_aggregate(rows)
+    print(f"\nTotal wall: {time.perf_counter() - t0:.1f}s | Wrote: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import time
+from collections import deque
+
+from astar import astar
+from heuristics import HeuristicPacmanMST, LRUCache, INF
+from incremental import RootedProblem
+from pacman_problem import rot_pos_many
+
+# số food tối đa giải thứ tự bằng Held-Karp (O(2^n · n^2)); lớn hơn dùng 2-opt + Or-opt
+HELD_KARP_MAX = 10
+# ngân sách expand của A* tới food đích: tỉ lệ max_expanded (tối thiểu TARGET_MIN_EXPANDED);
+# hết ngân sách thì lùi ngay về A*-MST thay vì đốt cả max_expanded
+TARGET_BUDGET = 0.025
+TARGET_MIN_EXPANDED = 2000
+
+# ---------- Khoảng cách tới exit / food ở cả 4 góc quay ----------
+class ExitRows:
+    """
+    rows[k][r*C+c]: BFS ngược từ exit trên lưới góc quay k (đã phá destroyed0, toạ độ góc 0),
+    bỏ qua ma; mỗi góc quay chỉ BFS khi cần. Lưới, exit và Pacman xoay cùng nhau nên khoảng
+    cách đi bộ không đổi khi xoay; riêng anchor đổi theo góc quay, nên teleport nối hợp anchor
+    của cả 4 góc quay (quy về góc k) -> vẫn là cận dưới khi đường đi cắt qua mốc xoay 30 bước.
+    source0 (toạ độ góc 0): BFS từ ô này thay cho exit (food đích).
+    """
+    def __init__(self, problem, destroyed0=(), source0=None):
+        self.problem = problem
+        tables = problem._tables
+        R0, C0 = tables[0].R, tables[0].C
+        self._sources = [t.exit_pos if source0 is None else rot_pos_many(source0, R0, C0, k)
+                         for k, t in enumerate(tables)]
+        self._destroyed = [tuple(sorted(rot_pos_many(p, R0, C0, k) for p in destroyed0)) for k in range(4)]
+        self._rows = [None] * 4
+
+    def __getitem__(self, k):
+        row = self._rows[k]
+        if row is None:
+            row = self._rows[k] = self._bfs(k)
+        return row
+
+    def _bfs(self, k):
+        problem = self.problem
+        tables = problem._tables
+        t = tables[k]
+        R, C = t.R, t.C
+        g = problem._grid_at(k, self._destroyed[k])
+        hub = set()
+        for k2 in range(4):
+            t2 = tables[k2]
+            aset = problem._anchors_at(k2, self._destroyed[k2])[1]
+            hub.update(rot_pos_many(p, t2.R, t2.C, k - k2) for p in aset)
+        hub = [p for p in hub if g[p[0]][p[1]] != '%']
+        row = [INF] * (R * C)
+        er, ec = self._sources[k]
+        if not (0 <= er < R and 0 <= ec < C) or g[er][ec] == '%':
+            return row
+        row[er * C + ec] = 0
+        dq = deque([(er, ec)])
+        hub_done = False
+        while dq:
+            r, c = dq.popleft()
+            d = row[r * C + c] + 1
+            nxt = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
+            if not hub_done and (r, c) in hub:
+                hub_done = True     # mọi anchor nối với nhau: chỉ cần nở một lần
+                nxt.extend(hub)
+            for nr, nc in nxt:
+                if 0 <= nr < R and 0 <= nc < C and row[nr * C + nc] == INF and g[nr][nc] != '%':
+                    row[nr * C + nc] = d
+                    dq.append((nr, nc))
+        return row
+
+# ExitRows dùng chung giữa các problem cùng lưới/nguồn (vd. GUI replan liên tục)
+_rows_cache = LRUCache(64)
+
+def shared_exit_rows(problem, destroyed0=frozenset(), source0=None):
+    t = problem._tables[0]
+    key = (t.grid, t.exit_pos if source0 is None else source0, frozenset(destroyed0))
+    rows = _rows_cache.get(key)
+    if rows is None:
+        rows = ExitRows(problem, tuple(sorted(destroyed0)), source0)
+        _rows_cache.put(key, rows)
+    return rows
+
+# ---------- Thứ tự ăn food trên ma trận khoảng cách ----------
+def tour_cost(D, seq):
+    return sum(D[a][b] for a, b in zip(seq, seq[1:]))
+
+def held_karp(D, n):
+    """
+    Đường đi mở tối ưu 0 -> mọi đỉnh 1..n -> n+1 (0 = Pacman, n+1 = exit).
+    -> (thứ tự các đỉnh 1..n, cost).
+    """
+    full = (1 << n) - 1
+    dp = [[INF] * n for _ in range(1 << n)]
+    par = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        dp[1 << j][j] = D[0][j + 1]
+    for mask in range(1, 1 << n):
+        row = dp[mask]
+        for j in range(n):
+            cur = row[j]
+            if cur >= INF or not (mask >> j) & 1:
+                continue
+            dj = D[j + 1]
+            for k in range(n):
+                if (mask >> k) & 1:
+                    continue
+                m2 = mask | (1 << k)
+                c = cur + dj[k + 1]
+                if c < dp[m2][k]:
+                    dp[m2][k] = c
+                    par[m2][k] = j
+    best, last = INF, 0
+    for j in range(n):
+        c = dp[full][j] + D[j + 1][n + 1]
+        if c < best:
+            best, last = c, j
+    order, mask = [], full
+    while last != -1:
+        order.append(last + 1)
+        last, mask = par[mask][last], mask & ~(1 << last)
+    order.reverse()
+    return order, best
+
+def local_search(D, n):
+    """Láng giềng gần nhất rồi 2-opt + Or-opt (dời đoạn 1-3 đỉnh) tới khi không cải thiện."""
+    left = set(range(1, n + 1))
+    seq = [0]
+    while left:
+        nxt = min(left, key=lambda j: D[seq[-1]][j])
+        seq.append(nxt)
+        left.remove(nxt)
+    seq.append(n + 1)
+
+    improved = True
+    while improved:
+        improved = False
+        # 2-opt: đảo đoạn seq[i..j] (giữ cố định hai đầu Pacman / exit)
+        for i in range(1, n):
+            for j in range(i + 1, n + 1):
+                a, b, c, d = seq[i - 1], seq[i], seq[j], seq[j + 1]
+                if D[a][c] + D[b][d] < D[a][b] + D[c][d]:
+                    seq[i:j + 1] = reversed(seq[i:j + 1])
+                    improved = True
+        # Or-opt: dời đoạn dài 1-3 sang chỗ khác (giữ chiều)
+        for ln in (1, 2, 3):
+            for i in range(1, n + 2 - ln):
+                seg = seq[i:i + ln]
+                rest = seq[:i] + seq[i + ln:]
+                base = tour_cost(D, seq)
+                for p in range(1, len(rest)):
+                    cand = rest[:p] + seg + rest[p:]
+                    if tour_cost(D, cand) < base:
+                        seq = cand
+                        improved = True
+                        break
+                else:
+                    continue
+                break
+    return seq[1:-1], tour_cost(D, seq)
+
+def order_foods(D, n):
+    """-> (thứ tự chỉ số food 1..n, độ dài tour, phương pháp)."""
+    if n == 0:
+        return [], D[0][1], "none"
+    if n <= HELD_KARP_MAX:
+        return (*held_karp(D, n), "held-karp")
+    return (*local_search(D, n), "2opt+oropt")
+
+# ---------- Heuristic tới một food cụ thể ----------
+class HeuristicTarget:
+    """
+    Khoảng cách tới food đích (toạ độ góc 0): ExitRows với nguồn là food đó, teleport nối anchor
+    của cả 4 góc quay nên vẫn là cận dưới khi đoạn đường cắt qua mốc xoay (bảng MST thì không).
+    Bỏ qua ma và việc ăn tường (như MST); không tới được -> INF.
+    """
+    def __init__(self, problem, target0):
+        self.problem = problem
+        self.target0 = target0
+        self.targets = [_from_frame0(problem, target0, k) for k in range(4)]
+        self._rows = {}      # tập tường đã phá (toạ độ góc 0) -> ExitRows
+
+    def target(self, s):
+        return self.targets[s.rot_idx % 4]
+
+    def h(self, s):
+        t = self.problem._tables[s.rot_idx % 4]
+        key = frozenset(rot_pos_many(p, t.R, t.C, -s.rot_idx) for p in s.destroyed)
+        rows = self._rows.get(key)
+        if rows is None:
+            rows = self._rows[key] = shared_exit_rows(self.problem, key, self.target0)
+        return rows[s.rot_idx % 4][s.pacman[0] * t.C + s.pacman[1]]
+
+def _frame0(problem, p, rot_idx):
+    t = problem._tables[rot_idx % 4]
+    return rot_pos_many(p, t.R, t.C, -rot_idx)
+
+def _from_frame0(problem, p, rot_idx):
+    t = problem._tables[0]
+    return rot_pos_many(p, t.R, t.C, rot_idx)
+
+# ---------- Planner cả tour ----------
+def plan_tour(problem, max_expanded=200000, time_limit=None, cancel=None, greedy=False):
+    """
+    Lập kế hoạch theo thứ tự ăn food toàn cục thay vì "food gần nhất trước":
+      1) ma trận khoảng cách Pacman/foods/exit dựng một lần trên lưới của state đầu (bỏ qua ma,
+         pie; teleport theo anchor cả 4 góc quay);
+      2) thứ tự: Held-Karp nếu ≤ HELD_KARP_MAX food, ngược lại 2-opt + Or-opt;
+      3) A* từng đoạn tới food kế tiếp (HeuristicTarget, ngân sách TARGET_BUDGET), food ăn tiện
+         đường thì bỏ qua; đoạn không tìm được (ma chặn, hết ngân sách) thì lùi về A*-MST
+         "bớt 1 food" như chuỗi tham lam;
+      4) đoạn cuối ra exit bằng A*-MST.
+    greedy=True: bỏ 1-2, mọi đoạn là A*-MST "bớt 1 food" (chuỗi tham lam trên cùng khung).
+    Kết quả cùng định dạng astar (+ "order" theo toạ độ góc 0, "tour_estimate", "method", "segments");
+    expanded/generated cộng mọi lần A*, kể cả lần thất bại.
+    """
+    t_start = time.perf_counter()
+    deadline = t_start + time_limit if time_limit is not None else None
+    s0 = problem.initial_state()
+    if greedy:
+        order, est, method = [], None, "greedy"
+    else:
+        foods = list(s0.foods)
+        k0 = s0.rot_idx % 4
+        C = problem._tables[k0].C
+        keys = [s0.pacman] + foods + [problem._exit_at(s0.rot_idx)]
+        destroyed0 = frozenset(_frame0(problem, p, s0.rot_idx) for p in s0.destroyed)
+        # một BFS ngược mỗi food/exit (teleport nối anchor cả 4 góc quay, như HeuristicTarget)
+        rows = [None] + [shared_exit_rows(problem, destroyed0, _frame0(problem, p, s0.rot_idx))[k0]
+                         for p in keys[1:-1]] + [shared_exit_rows(problem, destroyed0)[k0]]
+        D = [[0 if i == j else rows[max(i, j)][keys[min(i, j)][0] * C + keys[min(i, j)][1]]
+              for j in range(len(keys))] for i in range(len(keys))]
+        idx, est, method = order_foods(D, len(foods))
+        order = [_frame0(problem, foods[i - 1], s0.rot_idx) for i in idx]
+    target_budget = min(max_expanded, max(TARGET_MIN_EXPANDED, int(max_expanded * TARGET_BUDGET)))
+
+    states, actions = [s0], []
+    expanded = generated = segments = 0
+    out = {"order": order, "tour_estimate": est, "method": method}
+
+    def remaining():
+        return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+    def count(res):
+        nonlocal expanded, generated
+        expanded += res.get("expanded", 0)
+        generated += res.get("generated", 0)
+        return res
+
+    def stop(res):
+        out.update(res, solution=None, actions=[], cost=float("inf"),
+                   expanded=expanded, generated=generated)
+        return out
+
+    queue = list(order)
+    while states[-1].foods:
+        cur = states[-1]
+        while queue and _from_frame0(problem, queue[0], cur.rot_idx) not in cur.foods:
+            queue.pop(0)    # đã ăn tiện đường ở đoạn trước
+        sub = RootedProblem(problem, cur)
+        res = None
+        if queue:
+            hz = HeuristicTarget(problem, queue.pop(0))
+            res = count(astar(sub, hz, goal_fn=lambda s, hz=hz: hz.target(s) not in s.foods,
+                              max_expanded=target_budget, time_limit=remaining(), cancel=cancel))
+            if res.get("reason") in ("timeout", "cancelled"):
+                return stop(res)
+        if not res or not res.get("solution"):
+            n_after = len(cur.foods) - 1
+            res = count(astar(sub, HeuristicPacmanMST(sub), goal_fn=lambda s: len(s.foods) == n_after,
+                              max_expanded=max_expanded, time_limit=remaining(), cancel=cancel))
+            if not res.get("solution"):
+                return stop(res)
+        segments += 1
+        states.extend(res["solution"][1:])
+        actions.extend(res["actions"])
+
+    sub = RootedProblem(problem, states[-1])
+    res = count(astar(sub, HeuristicPacmanMST(sub), max_expanded=max_expanded,
+                      time_limit=remaining(), cancel=cancel))
+    if not res.get("solution"):
+        return stop(res)
+    states.extend(res["solution"][1:])
+    actions.extend(res["actions"])
+    out.update(solution=states, actions=actions, cost=float(len(actions)),
+               expanded=expanded, generated=generated, segments=segments + 1)
+    return out